@@ -4,27 +4,154 @@
 增强版：支持装饰符号、空格、英文单词数字等更多格式，并减少误判
 """
 import re
-from typing import List, Tuple, Optional
+import sys
+import functools
+from typing import Dict, List, Tuple, Optional
+
+# 可选依赖：安装了 google-re2 时使用其 DFA 引擎匹配合并后的规则（线性时间，无回溯）
+# 未安装时回退到标准库 re，行为一致
+try:
+    import re2 as _re2
+except ImportError:
+    _re2 = None
+
+
+# 以下规则与词表在进程内只构建一次，所有 ChapterDetector 实例共享
+
+# 用于检测行末是否为句子结束标点的正则
+_SENTENCE_END_PATTERN = re.compile(r'[，。；,;]+$')
+
+# 章节标题可能出现的首字符（括号、章节关键字、中英文数字等）
+# 用于在正则匹配前快速排除绝大多数正文行；IGNORECASE 下 S/I 还会匹配 ſ、ı、İ
+# 阿拉伯数字由 isdecimal() 判断，与正则中的 \d 一致（包括全角等 Unicode 数字）
+_FIRST_CHAR_SET = frozenset(
+    '[【(（'
+    '第零一二三四五六七八九十百千万'
+    '序前后楔尾引开终番附致结参目索上中下'
+    'CcPpSsBbVvIiXxLlſıİ'
+)
+
+# 误判过滤用的词表，预编译为正则，避免逐词 in 扫描
+# 常见动词和助词
+_COMMON_VERBS = ['的', '了', '在', '是', '有', '和', '与', '及', '写', '走', '看', '说', '想', '做', '来', '去', '到', '给', '让', '被', '把', '得', '很', '我', '你', '他', '她', '它', '们']
+# 明显的动作词和修饰词
+_ACTION_VERBS = ['写', '走', '看', '说', '想', '做', '来', '去', '到', '给', '让', '被', '把', '喜欢', '讨厌', '觉得', '认为']
+_MODIFIERS = ['得', '很', '非常', '特别', '十分']
+# 句子结构词
+_SENTENCE_PATTERNS = ['了', '的', '在', '中', '里', '上', '下', '着', '过']
+
+_VERB_RE = re.compile('[' + ''.join(_COMMON_VERBS) + ']')
+_ACTION_RE = re.compile('|'.join(_ACTION_VERBS))
+_MODIFIER_RE = re.compile('|'.join(_MODIFIERS))
+_SENTENCE_STRUCT_RE = re.compile('[' + ''.join(_SENTENCE_PATTERNS) + ']')
+
+# 英文章节关键字（英文规则共用）
+_ENGLISH_KEYWORDS = 'Chapter|Part|Section|Book|Volume'
+
+# 按语言挑选规则时使用：英文规则必须包含英文章节关键字，中文与特殊规则必须包含汉字
+_ENGLISH_KEYWORD_RE = re.compile(_ENGLISH_KEYWORDS, re.IGNORECASE)
+_HAN_RE = re.compile('[\u4e00-\u9fff]')
+
+# 可选的规则语言：'zh' 只用中文与特殊规则，'en' 只用英文规则（两者都包含数字开头的规则），'auto' 使用全部规则
+LANGUAGES = ('auto', 'zh', 'en')
+
+# RE2 的 \s 只包含 ASCII 空白，这里补齐 Python re 中 \s 额外匹配的 Unicode 空白（如全角空格）
+_RE2_EXTRA_SPACES = r'\x0b\x1c-\x1f\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}'
+
+
+def _to_re2_syntax(pattern: str) -> str:
+    """
+    将 Python re 语法的规则转换为 RE2 可用且语义一致的写法
+    \\s 补齐 Unicode 空白，\\d 改为 Unicode 十进制数字 \\p{Nd}，i 补齐大小写折叠，去掉非 ASCII 字符前多余的转义
+    参数:
+        pattern: Python re 正则表达式
+    返回:
+        RE2 正则表达式
+    """
+    result = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if nxt == 's':
+                result.append(r'\s' + _RE2_EXTRA_SPACES if in_class else r'[\s' + _RE2_EXTRA_SPACES + ']')
+            elif nxt == 'd':
+                result.append(r'\p{Nd}')
+            elif not nxt.isascii():
+                result.append(nxt)
+            else:
+                result.append(ch + nxt)
+            i += 2
+            continue
+        if ch == '[' and not in_class:
+            in_class = True
+        elif ch == ']' and in_class:
+            in_class = False
+        elif ch in 'iI':
+            # Python re 在 IGNORECASE 下让 i 同时匹配 ı、İ，RE2 不会，这里显式补上
+            result.append(ch + 'ıİ' if in_class else f'[{ch}ıİ]')
+            i += 1
+            continue
+        result.append(ch)
+        i += 1
+    return ''.join(result)
 
 
 class ChapterDetector:
     """章节检测器，使用正则表达式匹配各种章节格式"""
     
-    def __init__(self):
-        """初始化章节识别规则"""
-        # 编译一个用于检测行末是否为句子结束标点的正则
-        self.sentence_end_pattern = re.compile(r'[，。；,;]+$')
-        self.patterns = self._build_patterns()
+    def __init__(self, language: str = 'auto'):
+        """
+        初始化章节识别规则
+        参数:
+            language: 规则语言，'zh'、'en' 或 'auto'（全部规则）；已知书籍语言时只编译对应的规则子集
+        """
+        if language not in LANGUAGES:
+            raise ValueError(f"不支持的语言: {language}，可选值: {', '.join(LANGUAGES)}")
+        self.language = language
+        self.sentence_end_pattern = _SENTENCE_END_PATTERN
+        # 合并后的章节规则（re 或 re2 的已编译正则，两者都提供 match/lastgroup）
+        self.patterns, self._names = self._build_patterns(language)
+        
+        # 缓存去除空白后的判断结果（目录标题、页眉、分隔行等会被反复检测）
+        # 绑定到实例上，避免 lru_cache 装饰方法时以 self 为键导致检测器无法释放
+        self._check_title_cached = functools.lru_cache(maxsize=4096)(self._check_title)
     
-    def _build_patterns(self) -> List[Tuple[str, re.Pattern]]:
+    @staticmethod
+    def detect_language(lines: List[str]) -> str:
+        """
+        根据文本内容选择可以安全缩减的规则语言
+        不是按比例猜测：只有当另一种语言的规则在整段文本中不可能匹配时才缩减，
+        因此用返回的语言构建检测器，find_chapters 的结果与使用全部规则时完全一致
+        参数:
+            lines: 文本行列表
+        返回:
+            'zh'（没有英文章节关键字）、'en'（没有汉字）或 'auto'
+        """
+        text = '\n'.join(lines)
+        if _HAN_RE.search(text) is None:
+            return 'en'
+        if _ENGLISH_KEYWORD_RE.search(text) is None:
+            return 'zh'
+        return 'auto'
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_patterns(language: str = 'auto') -> Tuple[re.Pattern, Dict[str, str]]:
         """
         构建章节识别规则库（增强版）
-        返回: [(规则名称, 正则表达式模式), ...]
+        所有规则合并为一个带命名分组的正则，一次 match 即可完成全部规则的匹配
+        结果按进程和语言缓存，多个检测器实例不会重复编译
+        参数:
+            language: 规则语言，'zh'、'en' 或 'auto'
+        返回: (合并后的正则表达式, {分组名: 规则名称})
         """
         patterns = []
         
         # 英文数字单词库（常用）
-        eng_num_words = r'(One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten|Eleven|Twelve|Thirteen|Fourteen|Fifteen|Sixteen|Seventeen|Eighteen|Nineteen|Twenty|Thirty|Forty|Fifty|Sixty|Seventy|Eighty|Ninety|Hundred|First|Second|Third|Fourth|Fifth|Sixth|Seventh|Eighth|Ninth|Tenth)'
+        eng_num_words = r'(?:One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten|Eleven|Twelve|Thirteen|Fourteen|Fifteen|Sixteen|Seventeen|Eighteen|Nineteen|Twenty|Thirty|Forty|Fifty|Sixty|Seventy|Eighty|Ninety|Hundred|First|Second|Third|Fourth|Fifth|Sixth|Seventh|Eighth|Ninth|Tenth)'
         
         # --- 辅助正则片段 ---
         # 允许括号包裹：匹配 [ 【 ( （
@@ -37,70 +164,94 @@ class ChapterDetector:
         # 中文章节格式（增强版：支持括号、空格）
         chinese_patterns = [
             # 第x章（支持括号、空格）
-            (rf'{prefix_wrap}第{gap}[零一二三四五六七八九十百千万\d]+{gap}章{suffix_wrap}[^\n]*$', '第x章(增强)'),
+            (rf'{prefix_wrap}第{gap}[零一二三四五六七八九十百千万\d]+{gap}章', '第x章(增强)'),
             # 第x[节篇回卷部集册辑部分单元]（支持括号、空格）
-            (rf'{prefix_wrap}第{gap}[零一二三四五六七八九十百千万\d]+{gap}[节篇回卷部集册辑部分单元]{suffix_wrap}[^\n]*$', '第x[单位](增强)'),
+            (rf'{prefix_wrap}第{gap}[零一二三四五六七八九十百千万\d]+{gap}[节篇回卷部集册辑部分单元]', '第x[单位](增强)'),
             
             # 不带"第"的格式（支持括号）
-            (rf'{prefix_wrap}[零一二三四五六七八九十百千万\d]+{gap}[章节篇回卷部集册辑]{suffix_wrap}[^\n]*$', 'x[单位](增强)'),
+            (rf'{prefix_wrap}[零一二三四五六七八九十百千万\d]+{gap}[章节篇回卷部集册辑]', 'x[单位](增强)'),
             
             # 纯中文数字列表：一、 （一） 【一】 【二】
-            (rf'{prefix_wrap}[零一二三四五六七八九十百千万]+{gap}[、．.）\)\]】]{suffix_wrap}[^\n]*$', '中文数字列表'),
+            (rf'{prefix_wrap}[零一二三四五六七八九十百千万]+{gap}[、．.）\)\]】]', '中文数字列表'),
             (rf'{prefix_wrap}[零一二三四五六七八九十百千万]+{gap}[、．.）\)\]】]{suffix_wrap}$', '中文数字列表(纯)'),
         ]
         
         # 英文章节格式（增强版：支持英文单词数字、冒号分隔）
+        # 共用的英文章节关键字前缀
+        english_prefix = rf'{prefix_wrap}(?:{_ENGLISH_KEYWORDS}){gap}'
         english_patterns = [
             # Chapter x, Chapter 1: Title, Chapter One
-            (rf'^{prefix_wrap}(Chapter|Part|Section|Book|Volume){gap}[0-9IVXLC]+{suffix_wrap}[^\n]*$', 'English Numeric'),
+            (rf'{english_prefix}[0-9IVXLC]+', 'English Numeric'),
             # 支持英文单词数字: Chapter One, Part First
-            (rf'^{prefix_wrap}(Chapter|Part|Section|Book|Volume){gap}{eng_num_words}{suffix_wrap}[^\n]*$', 'English Word'),
-            # 支持连字符: Chapter Twenty-Five
-            (rf'^{prefix_wrap}(Chapter|Part){gap}({eng_num_words}[\s-]+)*{eng_num_words}{suffix_wrap}[^\n]*$', 'English Word Compound'),
+            # 也覆盖连字符写法 Chapter Twenty-Five：只要求首个数字单词，之后的内容不限
+            (rf'{english_prefix}{eng_num_words}', 'English Word'),
         ]
         
         # 数字开头的章节（严格限制，防止误判年份）
         number_patterns = [
             # 纯数字开头（带点或空格，且有后续内容）
-            (r'^\d+\.\s+[^\n]+$', '数字. 标题'),  # 1. Title
-            (r'^\d+、[^\n]+$', '数字、标题'),      # 1、标题
-            (r'^\d+）[^\n]+$', '数字）标题'),      # 1）标题
-            (r'^\d+\)\s*[^\n]+$', '数字)标题'),   # 1) Title
+            (r'^\d+\.\s+[^\n]', '数字. 标题'),  # 1. Title
+            (r'^\d+、[^\n]', '数字、标题'),      # 1、标题
+            (r'^\d+）[^\n]', '数字）标题'),      # 1）标题
+            (r'^\d+\)\s*[^\n]', '数字)标题'),   # 1) Title
             
             # 罗马数字开头
-            (r'^[IVXLC]+\.\s+[^\n]+$', '罗马数字.标题'),
-            (r'^[IVXLC]+\s+[^\n]+$', '罗马数字 标题'),
+            (r'^[IVXLC]+\.\s+[^\n]', '罗马数字.标题'),
+            (r'^[IVXLC]+\s+[^\n]', '罗马数字 标题'),
             
             # 中文数字开头（支持括号）
-            (rf'{prefix_wrap}[一二三四五六七八九十]+{gap}[、．.）\)]{suffix_wrap}[^\n]+$', '中文数字列表标题'),
-            (rf'{prefix_wrap}[零一二三四五六七八九十百千万]+{gap}[、．.）\)]{suffix_wrap}[^\n]+$', '完整中文数字列表标题'),
+            (rf'{prefix_wrap}[一二三四五六七八九十]+{gap}[、．.）\)]{suffix_wrap}[^\n]', '中文数字列表标题'),
+            (rf'{prefix_wrap}[零一二三四五六七八九十百千万]+{gap}[、．.）\)]{suffix_wrap}[^\n]', '完整中文数字列表标题'),
         ]
         
         # 特殊格式（增强版：添加番外、附录等）
         special_keywords = r'序言|前言|后记|楔子|尾声|引子|开场|终章|番外|番外篇|附录|致谢|结语|参考文献|参考文献|目录|索引'
         special_patterns = [
             # 特殊章节（支持括号）
-            (rf'{prefix_wrap}({special_keywords})[^\n]*$', '特殊章节'),
+            (rf'{prefix_wrap}(?:{special_keywords})', '特殊章节'),
             # 上中下（支持括号）
-            (rf'{prefix_wrap}(上|中|下)[篇部卷]?{suffix_wrap}$', '分卷指示'),
+            (rf'{prefix_wrap}(?:上|中|下)[篇部卷]?{suffix_wrap}$', '分卷指示'),
             # 第一、第二等（支持括号）
-            (rf'{prefix_wrap}第{gap}[一二三四五六七八九十]+{suffix_wrap}[^\n]*$', '第中文数字'),
-            (rf'{prefix_wrap}第{gap}[0-9]+{suffix_wrap}[^\n]*$', '第数字'),
+            (rf'{prefix_wrap}第{gap}[一二三四五六七八九十]+', '第中文数字'),
+            (rf'{prefix_wrap}第{gap}[0-9]+', '第数字'),
         ]
         
+        # 规则只描述标题开头的格式：match() 锚定行首，匹配到前缀即可，
+        # 因此原先用于吸收标题剩余部分的 "{suffix_wrap}[^\n]*$" 尾巴已省略
+        # （需要至少还有一个字符的规则以 [^\n] 结尾，需要整行匹配的规则仍以 $ 结尾）
+        
         # 组合所有模式（注意顺序：越具体的越前面）
-        all_str_patterns = chinese_patterns + english_patterns + special_patterns + number_patterns
+        # 按语言去掉的规则组不改变其余规则的相对顺序
+        if language == 'zh':
+            all_str_patterns = chinese_patterns + special_patterns + number_patterns
+        elif language == 'en':
+            all_str_patterns = english_patterns + number_patterns
+        else:
+            all_str_patterns = chinese_patterns + english_patterns + special_patterns + number_patterns
         
-        # 编译正则表达式
-        compiled_patterns = []
+        # 逐条校验后合并为一个正则（分支顺序即规则优先级，先匹配的分支胜出）
+        branches = []
+        names = {}
         for pattern_str, name in all_str_patterns:
             try:
                 # 使用 IGNORECASE 和 MULTILINE
-                compiled_patterns.append((name, re.compile(pattern_str, re.IGNORECASE | re.MULTILINE)))
+                re.compile(pattern_str, re.IGNORECASE | re.MULTILINE)
             except re.error as e:
                 print(f"警告: 正则表达式编译失败 {name}: {pattern_str}, 错误: {e}")
+                continue
+            group = f"rule_{len(branches)}"
+            # 去掉各规则自带的 ^ 锚点，由 match() 统一锚定在行首
+            branches.append(f"(?P<{group}>(?:{pattern_str.lstrip('^')}))")
+            # 规则名称会出现在每条识别结果中，驻留后所有结果共享同一个字符串对象
+            names[group] = sys.intern(name)
         
-        return compiled_patterns
+        combined = '|'.join(branches)
+        if _re2 is not None:
+            try:
+                return _re2.compile('(?im)' + _to_re2_syntax(combined)), names
+            except _re2.error as e:
+                print(f"警告: RE2 编译章节规则失败，回退到标准库 re: {e}")
+        return re.compile(combined, re.IGNORECASE | re.MULTILINE), names
     
     def is_chapter_title(self, text: str) -> Optional[str]:
         """
@@ -116,16 +267,30 @@ class ChapterDetector:
         # 去除首尾空白
         text = text.strip()
         
+        # 优化0: 首字符预过滤（不可能是标题开头的行直接跳过正则匹配）
+        if not text:
+            return None
+        first_char = text[0]
+        if first_char not in _FIRST_CHAR_SET and not first_char.isdecimal():
+            return None
+        
         # 优化1: 长度过滤（标题通常较短，超过60字符大概率是正文段落开头）
         if len(text) > 60:
             return None
         
-        # 先进行正则匹配
-        matched_rule = None
-        for name, pattern in self.patterns:
-            if pattern.match(text):
-                matched_rule = name
-                break
+        return self._check_title_cached(text)
+    
+    def _check_title(self, text: str) -> Optional[str]:
+        """
+        对已去除首尾空白、通过预过滤的文本进行规则匹配和误判过滤（结果由 lru_cache 缓存）
+        参数:
+            text: 已 strip 的非空文本（不超过60字符）
+        返回:
+            匹配的规则名称；否则返回None
+        """
+        # 先进行正则匹配（所有规则合并为一个正则，一次匹配）
+        m = self.patterns.match(text)
+        matched_rule = self._names[m.lastgroup] if m else None
         
         if not matched_rule:
             return None
@@ -142,20 +307,16 @@ class ChapterDetector:
                 return None
         
         # 优化3: 检查是否是明显的正文句子（包含动词、助词等）
-        # 常见动词和助词
-        common_verbs = ['的', '了', '在', '是', '有', '和', '与', '及', '写', '走', '看', '说', '想', '做', '来', '去', '到', '给', '让', '被', '把', '得', '很', '我', '你', '他', '她', '它', '们']
-        verb_count = sum(1 for v in common_verbs if v in text)
-        
         # 如果文本较长且包含多个常见动词/助词，可能是正文
         if len(text) > 20:
             # 如果包含3个或以上动词/助词，且长度>25，很可能是正文
-            if verb_count >= 3 and len(text) > 25:
+            # 统计出现的不同动词/助词个数（同一个词出现多次只计一次），只在长度满足时才扫描
+            if len(text) > 25 and len(set(_VERB_RE.findall(text))) >= 3:
                 return None
         elif len(text) > 12:
             # 对于较短的文本，如果包含明显的动作词（如"写"、"走"、"看"等），且后面跟着"得"、"很"等，可能是正文
-            action_verbs = ['写', '走', '看', '说', '想', '做', '来', '去', '到', '给', '让', '被', '把', '喜欢', '讨厌', '觉得', '认为']
-            has_action = any(v in text for v in action_verbs)
-            has_modifier = any(m in text for m in ['得', '很', '非常', '特别', '十分'])
+            has_action = _ACTION_RE.search(text) is not None
+            has_modifier = _MODIFIER_RE.search(text) is not None
             # 如果包含动作词和修饰词，且长度>12，很可能是正文句子
             if has_action and has_modifier:
                 return None
@@ -163,10 +324,8 @@ class ChapterDetector:
         # 优化4: 检查是否包含明显的句子结构（如"了...的"、"在...中"等）
         # 如果文本较长，且包含多个句子结构词，可能是完整句子而非标题
         if len(text) > 20:
-            sentence_patterns = ['了', '的', '在', '中', '里', '上', '下', '着', '过']
-            pattern_count = sum(1 for p in sentence_patterns if p in text)
-            # 如果包含4个或以上句子结构词，且长度>25，很可能是正文
-            if pattern_count >= 4 and len(text) > 25:
+            # 如果包含4个或以上句子结构词，且长度>25，很可能是正文（同样只在长度满足时才扫描）
+            if len(text) > 25 and len(set(_SENTENCE_STRUCT_RE.findall(text))) >= 4:
                 return None
         
         return matched_rule
@@ -180,12 +339,18 @@ class ChapterDetector:
             [(行号, 章节标题, 规则名称), ...]
         """
         chapters = []
+        check_title = self._check_title_cached
         for idx, line in enumerate(lines):
             line = line.strip()
-            if not line:
+            # 与 is_chapter_title 相同的预过滤（空行、首字符、长度），
+            # 行已去除首尾空白，通过后直接进入规则匹配，不再重复 strip 和检查
+            if not line or len(line) > 60:
+                continue
+            first_char = line[0]
+            if first_char not in _FIRST_CHAR_SET and not first_char.isdecimal():
                 continue
             
-            rule_name = self.is_chapter_title(line)
+            rule_name = check_title(line)
             if rule_name:
                 chapters.append((idx, line, rule_name))
         
@@ -4,25 +4,252 @@ EPUB文件解析模块
 使用EPUB的TOC（目录）来识别章节
 """
 import os
+import posixpath
 import zipfile
 import re
+import pickle
+import hashlib
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Dict, Tuple
-from bs4 import BeautifulSoup
+from urllib.parse import unquote
+from bs4 import UnicodeDammit
+from lxml import etree, html as lxml_html
 import ebooklib
 from ebooklib import epub
-from chapter_detector import ChapterDetector
+from ebooklib.utils import parse_string
+from chapter_detector import ChapterDetector, LANGUAGES, _ENGLISH_KEYWORD_RE, _HAN_RE
+
+try:
+    from zlib_ng import zlib_ng as _zlib_ng
+except ImportError:
+    _zlib_ng = None
+
+# 安装了 zlib-ng 时让 zipfile（包括 ebooklib 内部）用它解压 EPUB 中的 deflate 数据并校验 CRC32，
+# 接口与标准库 zlib 相同，未安装时保持标准库
+if _zlib_ng is not None:
+    zipfile.zlib = _zlib_ng
+    zipfile.crc32 = _zlib_ng.crc32
 
 # 抑制ebooklib的警告
 warnings.filterwarnings('ignore', category=UserWarning, module='ebooklib')
 warnings.filterwarnings('ignore', category=FutureWarning, module='ebooklib')
 
 
+# 文本清理时的切分点：str.splitlines() 认定的全部换行符，以及连续两个空格
+_TEXT_SPLIT_RE = re.compile('  |[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
+# TOC链接中的文件路径：去掉第一个 # 之后的锚点，以及最后一个 :// 之前的URL前缀
+_HREF_PATH_RE = re.compile(r'(?:[^#]*://)?([^#]*)')
+
+# 章节提取结果的磁盘缓存目录；章节规则的正则变化时由规则指纹自动区分，
+# 标题判断、文本提取等代码逻辑变化时需要递增版本号，使旧缓存失效
+CHAPTER_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'epub_to_txt'
+)
+CHAPTER_CACHE_VERSION = 2
+
+# 每个解析器在内存中保留最近提取的章节结果数量（重复转换同一文件时免去读取磁盘缓存）
+CHAPTER_MEMORY_CACHE_SIZE = 16
+
+# 书中文档总字节数达到该阈值且文档数足够多时，才使用多进程并行解析（小书的进程池开销大于收益）
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+PARALLEL_MIN_DOCUMENTS = 4
+
+
+# 各规则语言的章节规则指纹 {规则语言: 指纹}
+_RULES_FINGERPRINTS = {}
+
+
+def _chapter_rules_fingerprint(language: str) -> str:
+    """
+    计算解析器实际使用的章节识别规则的指纹，作为章节缓存键的一部分
+    包含所用规则组合并后的正则和规则名称；'auto' 时会按 detect_language 的结果改用 'zh' 或 'en' 规则，
+    因此还包含这两组规则和 detect_language 使用的正则。手动修改这些规则后指纹随之变化，旧缓存自动失效
+    参数:
+        language: 解析器的规则语言
+    返回:
+        规则指纹（十六进制字符串）
+    """
+    fingerprint = _RULES_FINGERPRINTS.get(language)
+    if fingerprint is None:
+        languages = LANGUAGES if language == 'auto' else (language,)
+        parts = []
+        for lang in languages:
+            pattern, names = ChapterDetector._build_patterns(lang)
+            parts.append(f"{lang}\0{pattern.pattern}\0{sorted(names.items())!r}")
+        if language == 'auto':
+            for regex in (_HAN_RE, _ENGLISH_KEYWORD_RE):
+                parts.append(f"{regex.pattern}\0{regex.flags}")
+        fingerprint = hashlib.sha1('\0\0'.join(parts).encode('utf-8')).hexdigest()
+        _RULES_FINGERPRINTS[language] = fingerprint
+    return fingerprint
+
+
+def _count_non_whitespace(text: str) -> int:
+    """
+    统计文本中的非空白字符数
+    str.split() 按与 str.isspace() 相同的空白字符切分，拼接后的长度即非空白字符数，
+    全部在C层完成，不再为每个字符生成一个列表元素
+    参数:
+        text: 文本
+    返回:
+        非空白字符数
+    """
+    return len(''.join(text.split()))
+
+
+def _document_to_lines(content: bytes) -> List[str]:
+    """
+    将单个文档内容解析为非空文本行（模块级函数，供进程池调用）
+    参数:
+        content: 文档原始字节
+    返回:
+        文本行列表
+    """
+    text = EpubParser._extract_text(content)
+    if not text:
+        return []
+    # _extract_text 输出的每一行都已去除首尾空白且非空，直接按行分割即可
+    return text.split('\n')
+
+
 class EpubParser:
     """EPUB文件解析器"""
     
-    def __init__(self):
-        self.chapter_detector = ChapterDetector()
+    def __init__(self, language: str = 'auto', parallel_documents: bool = True):
+        """
+        初始化解析器
+        参数:
+            language: 章节规则语言（'zh'、'en' 或 'auto'），为 'auto' 时按书籍内容缩减规则
+            parallel_documents: 大书是否用进程池并行解析文档；批量转换的工作进程/线程中应设为 False，避免嵌套进程池
+        """
+        self.parallel_documents = parallel_documents
+        self.chapter_detector = ChapterDetector(language)
+        # 按语言缓存的专用检测器（language 为 'auto' 时由文本识别使用）
+        self._detectors = {language: self.chapter_detector}
+        # 最近提取的章节结果 {(绝对路径, 修改时间, 文件大小): 章节列表}，按最近使用排序
+        self._chapter_memory_cache = OrderedDict()
+    
+    def _detector_for(self, lines: List[str]) -> ChapterDetector:
+        """
+        为整本书的文本行选择章节检测器
+        未指定语言时，去掉在这本书中不可能匹配的规则组，识别结果不变
+        参数:
+            lines: 文本行列表
+        返回:
+            章节检测器
+        """
+        if self.chapter_detector.language != 'auto':
+            return self.chapter_detector
+        language = ChapterDetector.detect_language(lines)
+        detector = self._detectors.get(language)
+        if detector is None:
+            detector = self._detectors[language] = ChapterDetector(language)
+        return detector
+    
+    def _load_documents(self, book) -> List[Tuple[str, List[str]]]:
+        """
+        解析书中所有文档，按原顺序返回有内容的文档
+        参数:
+            book: ebooklib读取的EpubBook对象
+        返回:
+            [(文档文件名, 文本行列表), ...]
+        """
+        documents = []
+        for item in book.get_items():
+            if item.get_type() == ebooklib.ITEM_DOCUMENT:
+                content = item.get_content()
+                if content:
+                    documents.append((item.get_name(), content))
+        
+        return self._parse_documents(documents, self.parallel_documents)
+    
+    @staticmethod
+    def _read_documents(epub_path: str) -> List[Tuple[str, bytes]]:
+        """
+        直接用zipfile和lxml读取EPUB中的HTML文档，按清单（manifest）顺序返回
+        只读取OPF清单中的XHTML文档，不像 epub.read_epub 那样解压全部图片、样式，
+        也不解析元数据、书脊和目录；文档仍包装为ebooklib的文档对象，
+        由其 get_content() 生成与 read_epub 完全一致的文档内容
+        参数:
+            epub_path: EPUB文件路径
+        返回:
+            [(文档文件名, 文档内容), ...]
+        """
+        opf_ns = epub.NAMESPACES['OPF']
+        book = epub.EpubBook()
+        documents = []
+        
+        with zipfile.ZipFile(epub_path, 'r') as zf:
+            container = parse_string(zf.read('META-INF/container.xml'))
+            opf_file = None
+            for root_file in container.findall('//xmlns:rootfile[@media-type]',
+                                               namespaces={'xmlns': epub.NAMESPACES['CONTAINERNS']}):
+                if root_file.get('media-type') == 'application/oebps-package+xml':
+                    opf_file = root_file.get('full-path')
+            if opf_file is None:
+                raise epub.EpubException(-1, 'Can not find container file')
+            opf_dir = posixpath.dirname(opf_file)
+            
+            def read(name):
+                return zf.read(posixpath.normpath(posixpath.join(opf_dir, name)))
+            
+            opf = parse_string(zf.read(posixpath.normpath(opf_file)))
+            for r in opf.find('{%s}manifest' % opf_ns):
+                if r.tag != '{%s}item' % opf_ns or r.get('media-type') != 'application/xhtml+xml':
+                    continue
+                
+                # 与 ebooklib 的 _load_manifest 保持一致的文档类型与读取路径
+                href = r.get('href')
+                properties = r.get('properties', '').split(' ')
+                if 'nav' in properties:
+                    item = epub.EpubNav(uid=r.get('id'), file_name=unquote(href))
+                    item.content = read(href)
+                elif 'cover' in properties:
+                    item = epub.EpubCoverHtml()
+                    item.content = read(unquote(href))
+                else:
+                    item = epub.EpubHtml(uid=r.get('id'), file_name=unquote(href))
+                    item.content = read(item.get_name())
+                item.book = book
+                
+                content = item.get_content()
+                if content:
+                    documents.append((item.get_name(), content))
+        
+        return documents
+    
+    @staticmethod
+    def _parse_documents(documents: List[Tuple[str, bytes]], parallel: bool = True) -> List[Tuple[str, List[str]]]:
+        """
+        将文档内容解析为文本行，丢弃没有文本的文档
+        文档较多且较大时使用进程池并行解析
+        参数:
+            documents: [(文档文件名, 文档内容), ...]
+            parallel: 是否允许使用进程池并行解析
+        返回:
+            [(文档文件名, 文本行列表), ...]
+        """
+        contents = [content for _, content in documents]
+        
+        results = None
+        # 批量转换时已经按文件并行，由调用方关闭 parallel，不再嵌套进程池
+        if (parallel
+                and len(contents) > PARALLEL_MIN_DOCUMENTS
+                and (os.cpu_count() or 1) > 1
+                and sum(len(c) for c in contents) >= PARALLEL_MIN_BYTES):
+            try:
+                with ProcessPoolExecutor() as executor:
+                    results = list(executor.map(_document_to_lines, contents, chunksize=4))
+            except Exception as e:
+                print(f"警告: 并行解析失败，改为逐个解析: {e}")
+        if results is None:
+            results = [_document_to_lines(content) for content in contents]
+        
+        return [(name, lines) for (name, _), lines in zip(documents, results) if lines]
     
     def get_toc(self, epub_path: str) -> List[Tuple[str, str]]:
         """
@@ -35,6 +262,24 @@ class EpubParser:
         try:
             # 使用ignore_ncx=True来避免警告
             book = epub.read_epub(epub_path, options={'ignore_ncx': False})
+        except Exception as e:
+            print(f"获取TOC失败 {epub_path}: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+        
+        return self._get_toc_from_book(book, epub_path)
+    
+    def _get_toc_from_book(self, book, epub_path: str) -> List[Tuple[str, str]]:
+        """
+        从已读取的EPUB对象中获取目录（TOC）
+        参数:
+            book: ebooklib读取的EpubBook对象
+            epub_path: EPUB文件路径（仅用于错误信息）
+        返回:
+            [(章节标题, 文件路径), ...]
+        """
+        try:
             toc = []
             
             # 获取目录结构
@@ -89,82 +334,179 @@ class EpubParser:
             文本行列表
         """
         try:
-            book = epub.read_epub(epub_path)
+            # 只需要正文文本，跳过 epub.read_epub 对整本书的完整解析
             all_lines = []
-            
-            # 遍历所有章节
-            for item in book.get_items():
-                if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    content = item.get_content()
-                    if content:
-                        soup = BeautifulSoup(content, 'html.parser')
-                        text = self._extract_text(soup)
-                        if text:
-                            # 按行分割并过滤空行
-                            lines = [line.strip() for line in text.split('\n') if line.strip()]
-                            all_lines.extend(lines)
-            
+            for _, lines in self._parse_documents(self._read_documents(epub_path), self.parallel_documents):
+                all_lines.extend(lines)
             return all_lines
         
         except Exception as e:
             print(f"解析EPUB文件失败 {epub_path}: {e}")
             return []
     
-    def _extract_text(self, soup: BeautifulSoup) -> str:
+    def _parse_book(self, book) -> List[str]:
+        """
+        从已读取的EPUB对象中提取文本内容
+        参数:
+            book: ebooklib读取的EpubBook对象
+        返回:
+            文本行列表
+        """
+        all_lines = []
+        
+        # 遍历所有章节
+        for _, lines in self._load_documents(book):
+            all_lines.extend(lines)
+        
+        return all_lines
+    
+    @staticmethod
+    def _extract_text(content: bytes) -> str:
         """
-        从BeautifulSoup对象中提取纯文本
+        从HTML/XHTML文档内容中提取纯文本（使用lxml解析）
         参数:
-            soup: BeautifulSoup对象
+            content: 文档原始字节
         返回:
             提取的文本
         """
-        # 移除script和style标签
-        for script in soup(["script", "style"]):
-            script.decompose()
+        # lxml 对没有 meta charset 的字节默认按 latin-1 解码，这里沿用 BeautifulSoup 的编码探测
+        encoding = UnicodeDammit(content, is_html=True).original_encoding
+        try:
+            tree = lxml_html.fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
+        except etree.ParserError:
+            # 只有空白的文档
+            return ''
+        
+        # 移除script和style标签（drop_tree 会保留标签后的尾随文本）
+        for element in list(tree.iter('script', 'style')):
+            element.drop_tree()
         
         # 获取文本
-        text = soup.get_text()
+        text = tree.text_content()
         
-        # 清理文本：合并多个空白字符
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+        # 清理文本：按换行和连续两个空格切分，去除每段首尾空白并丢弃空段
+        text = '\n'.join(filter(None, map(str.strip, _TEXT_SPLIT_RE.split(text))))
         
         return text
     
-    def extract_chapters(self, epub_path: str) -> List[dict]:
+    def extract_chapters(self, epub_path: str, use_cache: bool = True) -> List[dict]:
         """
         提取EPUB文件中的章节（使用TOC目录）
+        同一文件（路径、修改时间、大小均未变）再次提取时直接使用内存缓存或磁盘缓存
+        内存缓存返回的是同一个列表对象，调用方不应修改返回的章节
         参数:
             epub_path: EPUB文件路径
+            use_cache: 是否使用章节缓存
         返回:
             章节列表，每个章节包含: {'title': 标题, 'content': 内容行列表}
         """
+        cache_key = self._chapter_cache_key(epub_path) if use_cache else None
+        if cache_key is None:
+            return self._extract_chapters(epub_path)
+        
+        chapters = self._chapter_memory_cache.get(cache_key)
+        if chapters is not None:
+            self._chapter_memory_cache.move_to_end(cache_key)
+            return chapters
+        
+        chapters = self._extract_chapters_with_disk_cache(epub_path, self._chapter_cache_path(cache_key))
+        
+        if chapters:
+            self._chapter_memory_cache[cache_key] = chapters
+            if len(self._chapter_memory_cache) > CHAPTER_MEMORY_CACHE_SIZE:
+                self._chapter_memory_cache.popitem(last=False)
+        
+        return chapters
+    
+    def _extract_chapters_with_disk_cache(self, epub_path: str, cache_path: Optional[str]) -> List[dict]:
+        """
+        提取章节，优先读取磁盘缓存，并把新提取的结果写入磁盘缓存
+        参数:
+            epub_path: EPUB文件路径
+            cache_path: 缓存文件路径（为None时不使用磁盘缓存）
+        返回:
+            章节列表
+        """
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                print(f"警告: 读取章节缓存失败，重新解析: {e}")
+        
+        chapters = self._extract_chapters(epub_path)
+        
+        # 只缓存成功提取的结果
+        if cache_path and chapters:
+            try:
+                os.makedirs(CHAPTER_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(chapters, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, cache_path)
+            except Exception as e:
+                print(f"警告: 写入章节缓存失败: {e}")
+        
+        return chapters
+    
+    @staticmethod
+    def _chapter_cache_key(epub_path: str) -> Optional[Tuple[str, int, int]]:
+        """
+        计算EPUB文件的章节缓存键
+        参数:
+            epub_path: EPUB文件路径
+        返回:
+            (绝对路径, 修改时间, 文件大小)；文件无法访问时返回None
+        """
+        try:
+            stat = os.stat(epub_path)
+        except OSError:
+            return None
+        return os.path.abspath(epub_path), stat.st_mtime_ns, stat.st_size
+    
+    def _chapter_cache_path(self, cache_key: Tuple[str, int, int]) -> str:
+        """
+        计算章节缓存键对应的磁盘缓存路径
+        不同规则语言的解析器识别结果不同，缓存键中包含解析器的规则语言，互不读取对方的缓存
+        参数:
+            cache_key: _chapter_cache_key 返回的缓存键
+        返回:
+            缓存文件路径
+        """
+        key = "{}:{}:{}:{}:{}:{}".format(*cache_key, self.chapter_detector.language, CHAPTER_CACHE_VERSION,
+                                         _chapter_rules_fingerprint(self.chapter_detector.language))
+        return os.path.join(CHAPTER_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+    
+    def _extract_chapters(self, epub_path: str) -> List[dict]:
+        """
+        提取EPUB文件中的章节（不使用缓存）
+        参数:
+            epub_path: EPUB文件路径
+        返回:
+            章节列表
+        """
         try:
             # 使用ignore_ncx=False来避免警告（虽然会有警告，但功能正常）
+            # 只读取一次EPUB，TOC、文档内容和回退的文本识别都复用同一个book对象
             book = epub.read_epub(epub_path, options={'ignore_ncx': False})
             
             # 获取TOC目录（已使用章节识别规则过滤，只保留真正的章节标题）
-            toc_items = self.get_toc(epub_path)
+            toc_items = self._get_toc_from_book(book, epub_path)
             
             if not toc_items:
                 # 如果没有找到章节标题，回退到原来的方法（从文本中识别章节）
                 print(f"警告: TOC中没有找到章节标题，回退到文本识别方法")
-                return self._extract_chapters_from_text(epub_path)
+                return self._extract_chapters_from_text(epub_path, book)
             
             # 创建文件路径到内容的映射
-            file_content_map = {}
-            for item in book.get_items():
-                if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    file_name = item.get_name()
-                    content = item.get_content()
-                    if content:
-                        soup = BeautifulSoup(content, 'html.parser')
-                        text = self._extract_text(soup)
-                        if text:
-                            # 按行分割并过滤空行
-                            lines = [line.strip() for line in text.split('\n') if line.strip()]
-                            file_content_map[file_name] = lines
+            file_content_map = dict(self._load_documents(book))
+            
+            # 文件名索引：文件名 -> (完整路径, 内容行)，同名时保留第一个，与按顺序扫描的结果一致
+            files_by_base = {}
+            for fname, lines in file_content_map.items():
+                files_by_base.setdefault(os.path.basename(fname), (fname, lines))
+            # 部分匹配结果缓存（同一文件的多个锚点只扫描一次）
+            partial_matches = {}
             
             # 根据TOC提取章节
             chapters = []
@@ -177,51 +519,39 @@ class EpubParser:
             for i, (title, href) in enumerate(toc_items):
                 # 解析href，获取文件名
                 # href可能是相对路径，如 "chapter1.xhtml" 或 "OEBPS/chapter1.xhtml" 或完整URL
-                file_name = href.split('#')[0]  # 去掉锚点
-                # 去掉URL前缀（如果有）
-                if '://' in file_name:
-                    file_name = file_name.split('://')[-1]
+                # 一次匹配同时去掉锚点和URL前缀（如果有）
+                file_name = _HREF_PATH_RE.match(href).group(1)
                 # 标准化路径分隔符
                 file_name = file_name.replace('\\', '/')
                 # 只取文件名部分（去掉路径）
-                base_file_name = os.path.basename(file_name)
+                base_file_name = file_name.rpartition('/')[2]
                 
                 # 查找对应的文件内容
-                content_lines = []
-                matched_file = None
+                # 优先精确匹配文件名
+                hit = files_by_base.get(base_file_name)
                 
-                # 优先精确匹配
-                for fname, lines in file_content_map.items():
-                    fname_base = os.path.basename(fname)
-                    # 精确匹配文件名
-                    if fname_base == base_file_name or fname_base == file_name:
-                        matched_file = fname
-                        content_lines = lines
-                        break
+                # 如果没找到，尝试部分匹配（file_name 以 base_file_name 结尾，只需检查 base_file_name）
+                if hit is None:
+                    if base_file_name not in partial_matches:
+                        partial_matches[base_file_name] = next(
+                            ((fname, lines) for fname, lines in file_content_map.items() if base_file_name in fname),
+                            None
+                        )
+                    hit = partial_matches[base_file_name]
                 
-                # 如果没找到，尝试部分匹配
-                if not content_lines:
-                    for fname, lines in file_content_map.items():
-                        if base_file_name in fname or file_name in fname:
-                            matched_file = fname
-                            content_lines = lines
-                            break
+                matched_file, content_lines = hit if hit else (None, [])
                 
                 # 如果找到了内容
                 if content_lines and matched_file:
-                    # 计算内容字符数
-                    content_text = '\n'.join(content_lines)
-                    content_chars = len([c for c in content_text if not c.isspace()])
-                    
-                    # 检查内容是否足够（可能只是标题页）
-                    is_short_content = len(content_lines) < MIN_CONTENT_LINES or content_chars < MIN_CONTENT_CHARS
-                    
                     # 如果文件已经被使用过，合并内容
                     if matched_file in used_files:
                         # 合并到已有章节
                         existing_idx = used_files[matched_file]
                         chapters[existing_idx]['content'].extend(content_lines)
-                    elif is_short_content:
+                    # 检查内容是否足够（可能只是标题页）
+                    # 只在需要时统计字符数，且行数不足时无需统计（同一文件的多个锚点不再重复扫描全文）
+                    elif (len(content_lines) < MIN_CONTENT_LINES
+                            or _count_non_whitespace('\n'.join(content_lines)) < MIN_CONTENT_CHARS):
                         # 内容太少，可能是标题页，尝试合并到上一个章节
                         if chapters:
                             # 合并到最后一个章节
@@ -247,7 +577,7 @@ class EpubParser:
             
             # 如果没有找到章节，回退到原来的方法
             if not chapters:
-                return self._extract_chapters_from_text(epub_path)
+                return self._extract_chapters_from_text(epub_path, book)
             
             # 检查章节质量：如果大部分章节内容都很短，说明TOC可能不准确，回退到文本识别方法
             short_chapter_count = 0
@@ -255,7 +585,7 @@ class EpubParser:
             
             for chapter in chapters:
                 content_text = '\n'.join(chapter['content'])
-                content_chars = len([c for c in content_text if not c.isspace()])
+                content_chars = _count_non_whitespace(content_text)
                 total_content_chars += content_chars
                 if content_chars < MIN_CONTENT_CHARS:
                     short_chapter_count += 1
@@ -267,7 +597,7 @@ class EpubParser:
                 
                 if short_ratio > 0.5 or avg_chars < 200:
                     print(f"警告: TOC章节内容过短（{short_ratio:.1%}章节短于{MIN_CONTENT_CHARS}字符，平均{avg_chars:.0f}字符），回退到文本识别方法")
-                    return self._extract_chapters_from_text(epub_path)
+                    return self._extract_chapters_from_text(epub_path, book)
             
             return chapters
         
@@ -276,20 +606,28 @@ class EpubParser:
             # 回退到原来的方法
             return self._extract_chapters_from_text(epub_path)
     
-    def _extract_chapters_from_text(self, epub_path: str) -> List[dict]:
+    def _extract_chapters_from_text(self, epub_path: str, book=None) -> List[dict]:
         """
         从文本中提取章节（备用方法）
         参数:
             epub_path: EPUB文件路径
+            book: 已读取的EpubBook对象（可选，提供时不再重新读取文件）
         返回:
             章节列表
         """
-        lines = self.parse(epub_path)
+        if book is not None:
+            try:
+                lines = self._parse_book(book)
+            except Exception as e:
+                print(f"解析EPUB文件失败 {epub_path}: {e}")
+                lines = []
+        else:
+            lines = self.parse(epub_path)
         if not lines:
             return []
         
         # 查找所有章节标题
-        chapter_positions = self.chapter_detector.find_chapters(lines)
+        chapter_positions = self._detector_for(lines).find_chapters(lines)
         
         if not chapter_positions:
             # 如果没有找到章节标题，将整个内容作为一个章节
@@ -333,17 +671,18 @@ class EpubParser:
             output_dir = os.path.dirname(epub_path)
             output_path = os.path.join(output_dir, f"{base_name}.txt")
         
-        # 写入TXT文件
-        with open(output_path, 'w', encoding='utf-8') as f:
+        # 写入TXT文件（UTF-8，换行符统一为 \n）：每个章节拼接、编码后一次写入，避免逐行调用 write
+        separator = "=" * 50 + "\n\n"
+        with open(output_path, 'wb', buffering=1 << 20) as f:
             for chapter in chapters:
-                # 写入章节标题
-                f.write(f"\n{chapter['title']}\n")
-                f.write("=" * 50 + "\n\n")
-                
-                # 写入章节内容
-                for line in chapter['content']:
-                    f.write(line + "\n")
-                f.write("\n")
+                content = chapter['content']
+                # 章节标题、分隔线、章节内容（每行以换行结尾）、章节间空行
+                f.write(''.join((
+                    f"\n{chapter['title']}\n",
+                    separator,
+                    '\n'.join(content),
+                    "\n\n" if content else "\n"
+                )).encode('utf-8'))
         
         return output_path
 
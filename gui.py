@@ -2,9 +2,12 @@
 EPUB转TXT批量转换工具 - GUI界面
 """
 import os
+import re
 import sys
 import json
+import queue
 import threading
+from concurrent.futures import ProcessPoolExecutor
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 from pathlib import Path
@@ -20,11 +23,113 @@ if sys.platform == 'darwin':
     warnings.filterwarnings('ignore', category=RuntimeWarning)
 
 
+# 进程内共用的解析器和分割器（批量转换时每个工作进程各自创建一次，跨文件复用）
+_PARSER = None
+_SPLITTER = None
+_instances_lock = threading.Lock()
+
+
+def _get_parser():
+    """获取进程内共用的EPUB解析器"""
+    global _PARSER
+    if _PARSER is None:
+        with _instances_lock:
+            if _PARSER is None:
+                _PARSER = EpubParser()
+    return _PARSER
+
+
+def _init_worker():
+    """工作进程初始化：已按文件并行，解析器不再为单本书开进程池"""
+    global _PARSER
+    _PARSER = EpubParser(parallel_documents=False)
+
+
+def _get_splitter():
+    """获取进程内共用的文本分割器"""
+    global _SPLITTER
+    if _SPLITTER is None:
+        with _instances_lock:
+            if _SPLITTER is None:
+                _SPLITTER = TextSplitter()
+    return _SPLITTER
+
+
+def _convert_one(epub_file, output_dir):
+    """
+    转换单个EPUB文件（模块级函数，供进程池调用）
+    决策日志不能跨进程回调，先收集起来随结果一并返回
+    参数:
+        epub_file: EPUB文件路径
+        output_dir: 输出目录
+    返回:
+        ([(输出文件路径, 字数), ...], 总字数, 决策日志消息列表, 错误信息)，成功时错误信息为None
+    """
+    parser = _get_parser()
+    splitter = _get_splitter()
+    decisions = []
+    
+    try:
+        # 提取章节信息
+        chapters = parser.extract_chapters(epub_file)
+        
+        if not chapters:
+            return [], 0, decisions, "无法提取章节信息"
+        
+        # 统计每章和总字数（只统计章节内容，不包括标题），切分时复用每章字数
+        chapter_words = [splitter.count_content_words(ch['content']) for ch in chapters]
+        total_words = sum(chapter_words)
+        
+        # 计算分割份数
+        split_count = splitter.calculate_split_count(total_words)
+        
+        base_name = Path(epub_file).stem
+        output_files = []
+        # 每个输出文件的字数，写入和合并时顺带统计，不再重新读取输出文件
+        word_counts = {}
+        
+        if split_count > 1:
+            # 需要分割（使用新规则：按8万字在章节边界切分）
+            chapter_groups = splitter.split_by_word_count_at_chapter_boundary(chapters, chapter_words)
+            
+            # 分割后的文件名（路径前缀只拼接一次）
+            part_prefix = os.path.join(output_dir, f"{base_name}_part")
+            output_files = [f"{part_prefix}{i:02d}.txt" for i in range(1, len(chapter_groups) + 1)]
+            
+            # 在内存中合并字数过小的相邻部分，只写出合并后的文件（启用调试日志，收集后输出到GUI）
+            output_files = splitter.merge_small_groups(chapter_groups, output_files, debug=True,
+                                                       log_callback=decisions.append, word_counts=word_counts)
+        else:
+            # 不需要分割（与 convert_to_txt 写出相同的内容，但直接使用已提取的章节）
+            output_filename = f"{base_name}.txt"
+            output_path = os.path.join(output_dir, output_filename)
+            word_counts[output_path] = splitter.write_chapters_to_file(chapters, output_path)
+            output_files.append(output_path)
+        
+        output_info = [(output_file, word_counts[output_file]) for output_file in output_files]
+        return output_info, total_words, decisions, None
+    
+    except Exception as e:
+        return [], 0, decisions, f"处理失败: {e}"
+
+
+# 决策日志标签的关键字（各关键字之间没有重叠，finditer 能找出全部出现的类别）
+_DECISION_TAG_RE = re.compile(
+    r'(?P<warning>警告|⚠)|(?P<error>错误|✗|失败)|(?P<success>✓|成功|完成)'
+    r'|(?P<merge>合并|→)|(?P<file>\.txt|_part|文件:)'
+)
+# 同一条消息包含多类关键字时，按此顺序选择标签
+_DECISION_TAG_PRIORITY = ('warning', 'error', 'success', 'merge', 'file')
+
+
 class EpubConverterGUI:
     """EPUB转TXT转换工具GUI"""
     
     CONFIG_FILE = 'epub_converter_config.json'
     
+    # 日志最多保留的行数，超出后删除最早的内容（多删500行，避免每次刷新都要裁剪）
+    MAX_LOG_LINES = 5000
+    
     def __init__(self, root):
         self.root = root
         self.root.title("EPUB转TXT批量转换工具")
@@ -38,24 +143,61 @@ class EpubConverterGUI:
             pass
         
         # 变量
-        self.selected_files = []
+        self.selected_files = []  # [{'path': 文件路径, 'name': 文件名}, ...]
         self.output_dir = tk.StringVar()
         self.remember_dir = tk.BooleanVar()
         self.is_processing = False
-        self.is_paused = False
-        self.should_stop = False
+        # 暂停/终止状态：_pause_event 置位表示运行中，清除表示已暂停（暂停时工作线程阻塞等待）
+        self._pause_event = threading.Event()
+        self._pause_event.set()
+        self._stop_event = threading.Event()
         self.conversion_thread = None
         self.decision_log_auto_scroll = True  # 决策日志自动滚动标志
+        self._dirty_logs = set()  # 等待滚动刷新的日志组件
+        self._log_flush_scheduled = False  # 是否已安排延迟刷新
         
         # 加载配置
+        self._last_saved_config = None  # 配置文件中当前保存的内容，未变化时不再重复写入
+        self._cwd = os.getcwd()  # 目录选择对话框的默认起始目录（未设置输出目录时使用）
         self.load_config()
         
         # 创建UI
         self.create_widgets()
         
+        # 后台线程产生的转换日志、决策日志和完成通知经队列传回，由Tk主线程定时批量处理，
+        # 只有Tk主线程操作界面组件和日志刷新状态
+        # 只在转换期间定时处理队列（由 start_conversion 启动），空闲时不再定时唤醒
+        self._tk_thread = threading.current_thread()
+        self._log_queue = queue.Queue()
+        self._log_drain_active = False
+        
         # 绑定关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
+    @property
+    def is_paused(self):
+        """是否已暂停"""
+        return not self._pause_event.is_set()
+    
+    @is_paused.setter
+    def is_paused(self, value):
+        if value:
+            self._pause_event.clear()
+        else:
+            self._pause_event.set()
+    
+    @property
+    def should_stop(self):
+        """是否已请求终止"""
+        return self._stop_event.is_set()
+    
+    @should_stop.setter
+    def should_stop(self, value):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
+    
     def load_config(self):
         """加载配置文件"""
         if os.path.exists(self.CONFIG_FILE):
@@ -64,19 +206,25 @@ class EpubConverterGUI:
                     config = json.load(f)
                     self.output_dir.set(config.get('output_dir', ''))
                     self.remember_dir.set(config.get('remember_dir', False))
+                    self._last_saved_config = config
             except Exception as e:
                 print(f"加载配置失败: {e}")
     
     def save_config(self):
-        """保存配置文件"""
+        """保存配置文件（内容未变化时跳过；先写临时文件再替换，避免写入中断导致配置损坏）"""
         if self.remember_dir.get():
             try:
                 config = {
                     'output_dir': self.output_dir.get(),
                     'remember_dir': True
                 }
-                with open(self.CONFIG_FILE, 'w', encoding='utf-8') as f:
+                if config == self._last_saved_config:
+                    return
+                tmp_path = self.CONFIG_FILE + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
                     json.dump(config, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.CONFIG_FILE)
+                self._last_saved_config = config
             except Exception as e:
                 print(f"保存配置失败: {e}")
     
@@ -178,9 +326,49 @@ class EpubConverterGUI:
         )
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # 决策日志文本区域在首次使用时才创建（见 _ensure_decision_widget）
+        self._log_frame = log_frame
+        self.decision_log_text = None
+        
+        self.log_text.bind('<Map>', self._force_bg_color)
+        self._config_common_tags(self.log_text)
+        
+        # 4. 控制按钮区域
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
+        
+        self.start_button = ttk.Button(control_frame, text="开始转换", command=self.start_conversion)
+        self.start_button.grid(row=0, column=0, padx=(0, 10))
+        
+        self.pause_button = ttk.Button(control_frame, text="暂停", command=self.pause_conversion, state='disabled')
+        self.pause_button.grid(row=0, column=1, padx=(0, 10))
+        
+        self.resume_button = ttk.Button(control_frame, text="继续", command=self.resume_conversion, state='disabled')
+        self.resume_button.grid(row=0, column=2, padx=(0, 10))
+        
+        self.stop_button = ttk.Button(control_frame, text="终止", command=self.stop_conversion, state='disabled')
+        self.stop_button.grid(row=0, column=3, padx=(0, 10))
+        
+        self.clear_log_button = ttk.Button(control_frame, text="清除日志", command=self.clear_log)
+        self.clear_log_button.grid(row=0, column=4)
+        
+        # 进度条
+        self.progress = ttk.Progressbar(control_frame, mode='indeterminate')
+        self.progress.grid(row=0, column=5, padx=(20, 0), sticky=(tk.W, tk.E))
+        control_frame.columnconfigure(5, weight=1)
+    
+    def _ensure_decision_widget(self):
+        """
+        创建决策日志文本区域（只在第一次切换到决策日志或写入决策日志时创建）
+        返回:
+            决策日志文本组件
+        """
+        if self.decision_log_text is not None:
+            return self.decision_log_text
+        
         # 决策日志文本区域（初始隐藏，与转换日志在同一位置）
         self.decision_log_text = scrolledtext.ScrolledText(
-            log_frame, 
+            self._log_frame, 
             wrap=tk.WORD, 
             font=('Consolas', 9),
             bg='#e8e8e8',
@@ -198,52 +386,19 @@ class EpubConverterGUI:
         self.decision_log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         self.decision_log_text.grid_remove()
         
-        # 绑定滚动事件，检测用户是否手动滚动
-        def on_decision_scroll(*args):
-            # 检查是否滚动到底部
-            self.decision_log_text.see(tk.END)
-            # 如果用户手动滚动，暂时禁用自动滚动
-            # 通过检查滚动位置来判断
-            pass
-        
         def on_decision_scroll_wheel(event):
             # 用户手动滚动时，禁用自动滚动
             self.decision_log_auto_scroll = False
             # 5秒后重新启用自动滚动（如果用户没有继续滚动）
             self.root.after(5000, lambda: setattr(self, 'decision_log_auto_scroll', True))
         
+        # 绑定滚动事件，检测用户是否手动滚动
         self.decision_log_text.bind('<MouseWheel>', on_decision_scroll_wheel)
         self.decision_log_text.bind('<Button-4>', on_decision_scroll_wheel)  # Linux
         self.decision_log_text.bind('<Button-5>', on_decision_scroll_wheel)  # Linux
         
-        # 强制设置背景色（macOS可能需要多次设置）
-        # 使用after方法确保在窗口显示后设置
-        def force_bg_color():
-            try:
-                for text_widget in [self.log_text, self.decision_log_text]:
-                    text_widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-                    # 设置内部Text组件的背景（ScrolledText内部包含Text组件）
-                    for widget in text_widget.winfo_children():
-                        if isinstance(widget, tk.Text):
-                            widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-            except Exception as e:
-                print(f"设置背景色失败: {e}")
-        
-        # 延迟设置，确保窗口已创建（多次设置确保生效）
-        self.root.after(100, force_bg_color)
-        self.root.after(500, force_bg_color)
-        self.root.after(1000, force_bg_color)
-        
-        # 配置文本标签样式（用于高亮百分比）
-        # 确保所有颜色都是深色，在白色背景上可见
-        for text_widget in [self.log_text, self.decision_log_text]:
-            text_widget.tag_config('percentage', foreground='#d32f2f', font=('Consolas', 11, 'bold'))
-            text_widget.tag_config('arrow', foreground='#1976d2', font=('Consolas', 10, 'bold'))
-            text_widget.tag_config('success', foreground='#2e7d32', font=('Consolas', 10, 'bold'))  # 深绿色
-            text_widget.tag_config('error', foreground='#c62828', font=('Consolas', 10, 'bold'))  # 深红色
-            text_widget.tag_config('filename', foreground='#1565c0', font=('Consolas', 10))  # 深蓝色
-            text_widget.tag_config('normal', foreground='#212121', font=('Consolas', 10))  # 深灰色，默认文本
-            text_widget.tag_config('debug', foreground='#616161', font=('Consolas', 9))  # 决策日志用灰色
+        self.decision_log_text.bind('<Map>', self._force_bg_color)
+        self._config_common_tags(self.decision_log_text)
         
         # 为决策日志添加专门的标签样式
         self.decision_log_text.tag_config('debug_info', foreground='#616161', font=('Consolas', 9))  # 普通信息
@@ -253,29 +408,40 @@ class EpubConverterGUI:
         self.decision_log_text.tag_config('debug_merge', foreground='#1976d2', font=('Consolas', 9))  # 合并操作（蓝色）
         self.decision_log_text.tag_config('debug_file', foreground='#7b1fa2', font=('Consolas', 9))  # 文件名（紫色）
         
-        # 4. 控制按钮区域
-        control_frame = ttk.Frame(main_frame)
-        control_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
-        
-        self.start_button = ttk.Button(control_frame, text="开始转换", command=self.start_conversion)
-        self.start_button.grid(row=0, column=0, padx=(0, 10))
-        
-        self.pause_button = ttk.Button(control_frame, text="暂停", command=self.pause_conversion, state='disabled')
-        self.pause_button.grid(row=0, column=1, padx=(0, 10))
-        
-        self.resume_button = ttk.Button(control_frame, text="继续", command=self.resume_conversion, state='disabled')
-        self.resume_button.grid(row=0, column=2, padx=(0, 10))
-        
-        self.stop_button = ttk.Button(control_frame, text="终止", command=self.stop_conversion, state='disabled')
-        self.stop_button.grid(row=0, column=3, padx=(0, 10))
-        
-        self.clear_log_button = ttk.Button(control_frame, text="清除日志", command=self.clear_log)
-        self.clear_log_button.grid(row=0, column=4)
-        
-        # 进度条
-        self.progress = ttk.Progressbar(control_frame, mode='indeterminate')
-        self.progress.grid(row=0, column=5, padx=(20, 0), sticky=(tk.W, tk.E))
-        control_frame.columnconfigure(5, weight=1)
+        return self.decision_log_text
+    
+    @staticmethod
+    def _config_common_tags(text_widget):
+        """
+        配置两个日志共用的文本标签样式（用于高亮百分比等）
+        确保所有颜色都是深色，在白色背景上可见
+        参数:
+            text_widget: 日志文本组件
+        """
+        text_widget.tag_config('percentage', foreground='#d32f2f', font=('Consolas', 11, 'bold'))
+        text_widget.tag_config('arrow', foreground='#1976d2', font=('Consolas', 10, 'bold'))
+        text_widget.tag_config('success', foreground='#2e7d32', font=('Consolas', 10, 'bold'))  # 深绿色
+        text_widget.tag_config('error', foreground='#c62828', font=('Consolas', 10, 'bold'))  # 深红色
+        text_widget.tag_config('filename', foreground='#1565c0', font=('Consolas', 10))  # 深蓝色
+        text_widget.tag_config('normal', foreground='#212121', font=('Consolas', 10))  # 深灰色，默认文本
+        text_widget.tag_config('debug', foreground='#616161', font=('Consolas', 9))  # 决策日志用灰色
+    
+    @staticmethod
+    def _force_bg_color(event):
+        """
+        强制设置日志背景色（macOS 可能在窗口显示后才应用主题，覆盖创建时的背景色）
+        绑定在组件首次显示（<Map> 事件）时执行一次，之后解除绑定；日志插入时不再逐条检查
+        """
+        text_widget = event.widget
+        text_widget.unbind('<Map>')
+        try:
+            text_widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
+            # 设置内部Text组件的背景（ScrolledText内部包含Text组件）
+            for widget in text_widget.winfo_children():
+                if isinstance(widget, tk.Text):
+                    widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
+        except Exception as e:
+            print(f"设置背景色失败: {e}")
     
     def select_files(self):
         """选择EPUB文件"""
@@ -284,7 +450,8 @@ class EpubConverterGUI:
             filetypes=[("EPUB文件", "*.epub"), ("所有文件", "*.*")]
         )
         if files:
-            self.selected_files.extend(files)
+            # 选择时就取好文件名，刷新列表时不再逐个解析路径
+            self.selected_files.extend({'path': f, 'name': os.path.basename(f)} for f in files)
             self.update_file_listbox()
     
     def clear_files(self):
@@ -295,12 +462,13 @@ class EpubConverterGUI:
     def update_file_listbox(self):
         """更新文件列表显示"""
         self.file_listbox.delete(0, tk.END)
-        for file_path in self.selected_files:
-            self.file_listbox.insert(tk.END, os.path.basename(file_path))
+        if self.selected_files:
+            # 一次 insert 调用插入全部文件名
+            self.file_listbox.insert(tk.END, *[f['name'] for f in self.selected_files])
     
     def select_output_dir(self):
         """选择输出目录"""
-        dir_path = filedialog.askdirectory(title="选择输出目录", initialdir=self.output_dir.get() or os.getcwd())
+        dir_path = filedialog.askdirectory(title="选择输出目录", initialdir=self.output_dir.get() or self._cwd)
         if dir_path:
             self.output_dir.set(dir_path)
             if self.remember_dir.get():
@@ -311,15 +479,17 @@ class EpubConverterGUI:
         mode = self.log_mode.get()
         if mode == 'conversion':
             # 显示转换日志
-            self.decision_log_text.grid_remove()
+            if self.decision_log_text is not None:
+                self.decision_log_text.grid_remove()
             self.log_text.grid()
             log_frame = self.log_text.master
             log_frame.config(text="转换日志")
         else:
             # 显示决策日志
+            decision_log_text = self._ensure_decision_widget()
             self.log_text.grid_remove()
-            self.decision_log_text.grid()
-            log_frame = self.decision_log_text.master
+            decision_log_text.grid()
+            log_frame = decision_log_text.master
             log_frame.config(text="决策日志")
     
     def clear_log(self):
@@ -327,82 +497,150 @@ class EpubConverterGUI:
         mode = self.log_mode.get()
         if mode == 'conversion':
             self.log_text.delete(1.0, tk.END)
-        else:
+        elif self.decision_log_text is not None:
             self.decision_log_text.delete(1.0, tk.END)
     
+    @staticmethod
+    def _decision_tag(message):
+        """根据决策日志消息内容自动选择标签"""
+        # 一次扫描找出消息中出现的全部关键字类别，再按优先级选择标签
+        found = {m.lastgroup for m in _DECISION_TAG_RE.finditer(message)}
+        for name in _DECISION_TAG_PRIORITY:
+            if name in found:
+                return f'debug_{name}'
+        return 'debug_info'
+    
     def log_decision(self, message, tag='debug_info'):
         """添加决策日志消息"""
-        # 确保背景色设置正确
-        try:
-            current_bg = self.decision_log_text.cget('bg')
-            white_colors = ['white', '#ffffff', '#FFFFFF', 'SystemWindowBackgroundColor', 
-                          'systemWindowBackgroundColor', '#fafafa', '']
-            if current_bg in white_colors:
-                self.decision_log_text.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-                for widget in self.decision_log_text.winfo_children():
-                    if isinstance(widget, tk.Text):
-                        widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-        except:
-            pass
-        
         # 根据消息内容自动选择标签
         if tag == 'debug_info':
-            if '警告' in message or '⚠' in message:
-                tag = 'debug_warning'
-            elif '错误' in message or '✗' in message or '失败' in message:
-                tag = 'debug_error'
-            elif '✓' in message or '成功' in message or '完成' in message:
-                tag = 'debug_success'
-            elif '合并' in message or '→' in message:
-                tag = 'debug_merge'
-            elif any(keyword in message for keyword in ['.txt', '_part', '文件:']):
-                tag = 'debug_file'
-        
-        self.decision_log_text.insert(tk.END, message, tag)
-        
-        # 只在自动滚动启用时才滚动到底部
-        if self.decision_log_auto_scroll:
-            self.decision_log_text.see(tk.END)
+            tag = self._decision_tag(message)
         
-        self.root.update_idletasks()
+        decision_log_text = self._ensure_decision_widget()
+        decision_log_text.insert(tk.END, message, tag)
+        self._schedule_log_flush(decision_log_text)
+    
+    def _drain_log_queue(self):
+        """
+        将后台线程放入队列的日志批量写入对应的日志组件（在Tk主线程中定时执行）
+        每次最多取200条，每个日志组件合并为一次 insert 调用；取到完成通知时恢复界面状态
+        队列中的元素: ('log', [(文本, 标签列表), ...])、('decision', 消息) 或 ('done', None)
+        """
+        log_args = []
+        decision_args = []
+        done = False
+        try:
+            for _ in range(200):
+                kind, payload = self._log_queue.get_nowait()
+                if kind == 'log':
+                    for text, tags in payload:
+                        log_args.append(text)
+                        log_args.append(tuple(tags))
+                elif kind == 'decision':
+                    decision_args.append(payload)
+                    decision_args.append(self._decision_tag(payload))
+                else:
+                    # 完成通知之前的日志都已取出，先写入日志再恢复界面
+                    done = True
+                    break
+        except queue.Empty:
+            pass
+        
+        if log_args:
+            self.log_text.insert(tk.END, *log_args)
+            self._schedule_log_flush(self.log_text)
+        if decision_args:
+            decision_log_text = self._ensure_decision_widget()
+            decision_log_text.insert(tk.END, *decision_args)
+            self._schedule_log_flush(decision_log_text)
+        if done:
+            self.conversion_complete()
+        
+        # 转换结束且队列已取空时停止定时处理，下次开始转换时重新启动
+        if self.is_processing or not self._log_queue.empty():
+            self.root.after(50, self._drain_log_queue)
+        else:
+            self._log_drain_active = False
+    
+    def _start_log_drain(self):
+        """启动日志队列的定时处理（已在运行时不重复启动）"""
+        if not self._log_drain_active:
+            self._log_drain_active = True
+            self.root.after(50, self._drain_log_queue)
     
     def log_message(self, message, tags=None):
         """添加日志消息"""
         # 如果没有指定标签，使用默认的normal标签（深色）
         if tags is None:
             tags = ['normal']
-        # 确保背景色设置正确（每次插入时强制检查）
-        try:
-            current_bg = self.log_text.cget('bg')
-            # 检查是否是白色或系统默认色
-            white_colors = ['white', '#ffffff', '#FFFFFF', 'SystemWindowBackgroundColor', 
-                          'systemWindowBackgroundColor', '#fafafa', '']
-            if current_bg in white_colors:
-                # 强制设置为浅灰色
-                self.log_text.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-                # 设置内部Text组件的背景（ScrolledText内部包含Text组件）
-                for widget in self.log_text.winfo_children():
-                    if isinstance(widget, tk.Text):
-                        widget.config(bg='#e8e8e8', highlightbackground='#e8e8e8', highlightcolor='#e8e8e8')
-        except:
-            pass
-        self.log_text.insert(tk.END, message, tags)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.log_segments([(message, tags)])
     
-    def log_conversion_result(self, epub_file, output_files, total_words):
-        """记录转换结果"""
-        epub_name = os.path.basename(epub_file)
-        
-        # 计算每个输出文件的字数
-        splitter = TextSplitter()
-        results = []
-        total_output_words = 0
+    def log_segments(self, segments):
+        """
+        一次性添加多段带标签的日志消息
+        所有片段合并为一次 insert 调用，最后只滚动和刷新一次界面
+        在后台线程中调用时放入队列，由Tk主线程写入
+        参数:
+            segments: [(文本, 标签列表), ...]
+        """
+        # 队列中还有未写入的日志时也排到队列后面，保持日志顺序
+        if threading.current_thread() is not self._tk_thread or not self._log_queue.empty():
+            self._log_queue.put(('log', segments))
+            return
         
-        for output_file in output_files:
-            words = splitter.count_words_in_file(output_file)
-            total_output_words += words
-            results.append((output_file, words))
+        # Text.insert 支持 (文本, 标签, 文本, 标签, ...) 交替传入
+        args = []
+        for text, tags in segments:
+            args.append(text)
+            args.append(tuple(tags))
+        self.log_text.insert(tk.END, *args)
+        self._schedule_log_flush(self.log_text)
+    
+    def _schedule_log_flush(self, widget):
+        """
+        标记日志有新内容，并安排一次延迟刷新
+        连续插入的日志合并为每50毫秒最多一次滚动和界面刷新
+        参数:
+            widget: 有新内容的日志文本组件
+        """
+        self._dirty_logs.add(widget)
+        if not self._log_flush_scheduled:
+            self._log_flush_scheduled = True
+            self.root.after(50, self._flush_logs)
+    
+    def _flush_logs(self):
+        """滚动有新内容的日志到底部并刷新界面"""
+        self._log_flush_scheduled = False
+        dirty, self._dirty_logs = self._dirty_logs, set()
+        for widget in dirty:
+            self._trim_log(widget)
+        if self.log_text in dirty:
+            self.log_text.see(tk.END)
+        # 决策日志只在自动滚动启用时才滚动到底部
+        if self.decision_log_text in dirty and self.decision_log_auto_scroll:
+            self.decision_log_text.see(tk.END)
+        self.root.update_idletasks()
+    
+    def _trim_log(self, widget):
+        """
+        日志超过 MAX_LOG_LINES 行时删除最早的内容，限制内存占用和重绘开销
+        参数:
+            widget: 日志文本组件
+        """
+        line_count = int(widget.index('end-1c').split('.')[0])
+        if line_count > self.MAX_LOG_LINES:
+            widget.delete('1.0', f'{line_count - self.MAX_LOG_LINES + 500}.0')
+    
+    def log_conversion_result(self, epub_name, output_info, total_words):
+        """
+        记录转换结果
+        参数:
+            epub_name: EPUB文件名（选择文件时已取好）
+            output_info: [(输出文件路径, 字数), ...]
+            total_words: EPUB章节内容总字数
+        """
+        results = output_info
+        total_output_words = sum(words for _, words in results)
         
         # 计算百分比
         if total_words > 0:
@@ -410,56 +648,45 @@ class EpubConverterGUI:
         else:
             percentage = 0
         
-        # 显示结果
-        self.log_message(f"\n", [])
-        self.log_message(f"📖 ", [])
-        self.log_message(f"{epub_name}\n", ['filename'])
+        # 显示结果（先拼好全部片段，再一次性插入）
+        segments = [
+            ("\n", []),
+            ("📖 ", []),
+            (f"{epub_name}\n", ['filename']),
+        ]
         
-        if len(results) == 1:
-            # 单个文件，简单显示
-            output_file, words = results[0]
+        # 单个文件与多个文件的显示方式相同：每个输出文件一行
+        for output_file, words in results:
             output_name = os.path.basename(output_file)
             file_percentage = (words / total_words * 100) if total_words > 0 else 0
             
-            self.log_message(f"  ", [])
-            self.log_message(f"{epub_name}", ['filename'])
-            self.log_message(f" ", [])
-            self.log_message(f" ──→ ", ['arrow'])
-            self.log_message(f" ", [])
-            self.log_message(f"{output_name}", ['filename'])
-            self.log_message(f" (", [])
-            self.log_message(f"{words:,}", [])
-            self.log_message(f" 字, ", [])
-            self.log_message(f"{file_percentage:.1f}%", ['percentage'])
-            self.log_message(f")\n", [])
-        else:
-            # 多个文件，显示每个文件
-            for i, (output_file, words) in enumerate(results, 1):
-                output_name = os.path.basename(output_file)
-                file_percentage = (words / total_words * 100) if total_words > 0 else 0
-                
-                self.log_message(f"  ", [])
-                self.log_message(f"{epub_name}", ['filename'])
-                self.log_message(f" ", [])
-                self.log_message(f" ──→ ", ['arrow'])
-                self.log_message(f" ", [])
-                self.log_message(f"{output_name}", ['filename'])
-                self.log_message(f" (", [])
-                self.log_message(f"{words:,}", [])
-                self.log_message(f" 字, ", [])
-                self.log_message(f"{file_percentage:.1f}%", ['percentage'])
-                self.log_message(f")\n", [])
+            segments += [
+                ("  ", []),
+                (epub_name, ['filename']),
+                (" ", []),
+                (" ──→ ", ['arrow']),
+                (" ", []),
+                (output_name, ['filename']),
+                (" (", []),
+                (f"{words:,}", []),
+                (" 字, ", []),
+                (f"{file_percentage:.1f}%", ['percentage']),
+                (")\n", []),
+            ]
         
         # 总计信息
-        self.log_message(f"  ", [])
-        self.log_message(f"总计: ", [])
-        self.log_message(f"{total_output_words:,}", [])
-        self.log_message(f" 字 / ", [])
-        self.log_message(f"{total_words:,}", [])
-        self.log_message(f" 字 = ", [])
-        self.log_message(f"{percentage:.1f}%", ['percentage'])
-        self.log_message(f"\n", [])
-        self.log_message(f"{'─' * 80}\n", [])
+        segments += [
+            ("  ", []),
+            ("总计: ", []),
+            (f"{total_output_words:,}", []),
+            (" 字 / ", []),
+            (f"{total_words:,}", []),
+            (" 字 = ", []),
+            (f"{percentage:.1f}%", ['percentage']),
+            ("\n", []),
+            (f"{'─' * 80}\n", []),
+        ]
+        self.log_segments(segments)
     
     def start_conversion(self):
         """开始转换"""
@@ -496,6 +723,7 @@ class EpubConverterGUI:
         self.resume_button.config(state='disabled')
         self.stop_button.config(state='normal')
         self.progress.start()
+        self._start_log_drain()
         
         self.conversion_thread = threading.Thread(target=self.convert_files, args=(output_dir,))
         self.conversion_thread.daemon = True
@@ -526,93 +754,76 @@ class EpubConverterGUI:
                 self.log_message("⏹ 正在终止转换...\n", ['error'])
     
     def convert_files(self, output_dir):
-        """转换文件（在后台线程中执行）"""
-        parser = EpubParser()
-        splitter = TextSplitter()
-        
-        total_files = len(self.selected_files)
+        """转换文件（在后台线程中执行，多个文件时在进程池中并行转换）"""
+        files = [f['path'] for f in self.selected_files]
+        names = [f['name'] for f in self.selected_files]
+        total_files = len(files)
         success_count = 0
         fail_count = 0
         
+        # 每个文件的解析、分割、写入互不相关，按CPU核数并行；只有一个文件时直接在本线程转换
+        workers = min(total_files, os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+        futures = []
+        
         self.log_message(f"开始处理 {total_files} 个文件...\n", ['success'])
         self.log_message(f"{'=' * 80}\n", [])
         
-        for idx, epub_file in enumerate(self.selected_files, 1):
-            # 检查是否需要停止
-            if self.should_stop:
-                self.log_message(f"\n转换已终止（已处理 {idx-1}/{total_files} 个文件）\n", ['error'])
-                break
-            
-            # 等待暂停状态解除
-            while self.is_paused and not self.should_stop:
-                threading.Event().wait(0.1)
-            
-            if self.should_stop:
-                break
-            
-            try:
-                self.log_message(f"[{idx}/{total_files}] 处理: {os.path.basename(epub_file)}\n", [])
-                
-                # 提取章节信息
-                chapters = parser.extract_chapters(epub_file)
-                
-                if not chapters:
-                    self.log_message(f"  ✗ 无法提取章节信息\n", ['error'])
-                    fail_count += 1
-                    continue
-                
-                # 统计总字数（只统计章节内容，不包括标题）
-                total_words = sum(splitter.count_content_words(ch['content']) for ch in chapters)
+        try:
+            for idx, epub_file in enumerate(files, 1):
+                # 检查是否需要停止
+                if self.should_stop:
+                    self.log_message(f"\n转换已终止（已处理 {idx-1}/{total_files} 个文件）\n", ['error'])
+                    break
                 
-                # 计算分割份数
-                split_count = splitter.calculate_split_count(total_words)
+                # 等待暂停状态解除（暂停期间不再提交新文件，已提交的文件继续转换）
+                # 终止时会同时解除暂停，阻塞等待不会错过终止请求
+                self._pause_event.wait()
                 
-                base_name = os.path.splitext(os.path.basename(epub_file))[0]
-                output_files = []
+                if self.should_stop:
+                    break
                 
-                if split_count > 1:
-                    # 需要分割（使用新规则：按8万字在章节边界切分）
-                    chapter_groups = splitter.split_by_word_count_at_chapter_boundary(chapters)
+                try:
+                    self.log_message(f"[{idx}/{total_files}] 处理: {names[idx - 1]}\n", [])
                     
-                    for i, group in enumerate(chapter_groups):
-                        output_filename = f"{base_name}_part{i+1:02d}.txt"
-                        output_path = os.path.join(output_dir, output_filename)
-                        splitter.write_chapters_to_file(group, output_path)
-                        output_files.append(output_path)
+                    if executor is not None:
+                        # 保持最多 workers 个文件同时转换，按原顺序取结果，日志顺序与逐个转换时一致
+                        while len(futures) < min(idx - 1 + workers, total_files):
+                            futures.append(executor.submit(_convert_one, files[len(futures)], output_dir))
+                        result = futures[idx - 1].result()
+                    else:
+                        result = _convert_one(epub_file, output_dir)
+                    output_info, total_words, decisions, error = result
                     
-                    # 合并字数过小的相邻文件（启用调试日志，输出到GUI）
-                    def decision_log_callback(msg):
-                        # 检查是否需要停止
+                    # 输出合并决策日志（放入队列，由Tk主线程定时批量写入）
+                    for msg in decisions:
                         if self.should_stop:
-                            return
-                        # 等待暂停状态解除
-                        while self.is_paused and not self.should_stop:
-                            threading.Event().wait(0.1)
-                        if not self.should_stop:
-                            self.root.after(0, lambda m=msg: self.log_decision(m))
-                    output_files = splitter.merge_small_files(output_files, debug=True, log_callback=decision_log_callback)
+                            break
+                        self._log_queue.put(('decision', msg))
+                    
+                    if error is not None:
+                        self.log_message(f"  ✗ {error}\n", ['error'])
+                        fail_count += 1
+                        continue
                     
                     # 检查是否需要停止
                     if self.should_stop:
                         break
-                else:
-                    # 不需要分割
-                    output_filename = f"{base_name}.txt"
-                    output_path = os.path.join(output_dir, output_filename)
-                    parser.convert_to_txt(epub_file, output_path)
-                    output_files.append(output_path)
-                
-                # 检查是否需要停止
-                if self.should_stop:
-                    break
-                
-                # 记录转换结果
-                self.log_conversion_result(epub_file, output_files, total_words)
-                success_count += 1
-                
-            except Exception as e:
-                self.log_message(f"  ✗ 处理失败: {e}\n", ['error'])
-                fail_count += 1
+                    
+                    # 记录转换结果
+                    self.log_conversion_result(names[idx - 1], output_info, total_words)
+                    success_count += 1
+                    
+                except Exception as e:
+                    self.log_message(f"  ✗ 处理失败: {e}\n", ['error'])
+                    fail_count += 1
+        finally:
+            if executor is not None:
+                # 终止时取消尚未开始的文件，并等待正在转换的文件写完，
+                # 避免重新开始转换后与残留的工作进程同时写入同名文件
+                if any(future.running() for future in futures):
+                    self.log_message("正在等待进行中的文件完成...\n", ['error'])
+                executor.shutdown(wait=True, cancel_futures=True)
         
         # 完成
         self.log_message(f"\n", [])
@@ -622,11 +833,13 @@ class EpubConverterGUI:
         else:
             self.log_message(f"处理完成！成功: {success_count} 个，失败: {fail_count} 个\n", ['success'])
         
-        # 恢复UI状态
-        self.root.after(0, self.conversion_complete)
+        # 恢复UI状态（放在日志之后入队，由Tk主线程在写完日志后执行）
+        self._log_queue.put(('done', None))
     
     def conversion_complete(self):
         """转换完成"""
+        # 先记下是否是被终止的，再重置状态
+        stopped = self.should_stop
         self.is_processing = False
         self.is_paused = False
         self.should_stop = False
@@ -635,8 +848,29 @@ class EpubConverterGUI:
         self.resume_button.config(state='disabled')
         self.stop_button.config(state='disabled')
         self.progress.stop()
-        if not self.should_stop:
-            messagebox.showinfo("完成", "转换完成！")
+        if not stopped:
+            # 使用自动消失的提示，不阻塞界面（模态对话框会推迟下一批转换）
+            self._show_toast("转换完成！")
+    
+    def _show_toast(self, message, duration=3000):
+        """
+        在主窗口中央显示一条自动消失的非模态提示
+        参数:
+            message: 提示文字
+            duration: 显示时长（毫秒）
+        """
+        toast = tk.Toplevel(self.root)
+        toast.overrideredirect(True)
+        toast.attributes('-topmost', True)
+        ttk.Label(toast, text=message, padding=(20, 10)).pack()
+        
+        # 居中显示在主窗口上方
+        toast.update_idletasks()
+        x = self.root.winfo_rootx() + (self.root.winfo_width() - toast.winfo_reqwidth()) // 2
+        y = self.root.winfo_rooty() + (self.root.winfo_height() - toast.winfo_reqheight()) // 2
+        toast.geometry(f"+{x}+{y}")
+        
+        toast.after(duration, toast.destroy)
 
 
     def on_closing(self):
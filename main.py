@@ -1,130 +1,470 @@
 """
 EPUB转TXT批量转换工具主程序
 """
+import io
 import os
 import sys
-import argparse
-from pathlib import Path
+import hashlib
+import zipfile
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Iterator
 from epub_parser import EpubParser
 from text_splitter import TextSplitter
 
+# EPUB文件扩展名（只比较文件名末尾，不区分大小写）
+_EPUB_SUFFIX = '.epub'
 
-def find_epub_files(directory: str) -> list:
+# 按顺序转换时最多提前提取章节的文件数
+PREFETCH_FILES = 4
+
+# 并行方式：多进程（默认）或多线程
+EXECUTORS = ('process', 'thread')
+
+# 进程内共用的解析器和分割器（由 _init_worker 创建，每个工作进程各自一份）
+_PARSER = None
+_SPLITTER = None
+# 线程池的工作线程各自使用的解析器和分割器（解析器的缓存不能被多个线程同时修改）
+_thread_instances = threading.local()
+
+
+def find_epub_files(directory: str) -> Iterator[str]:
     """
-    查找目录中的所有EPUB文件
+    查找目录中的所有EPUB文件（逐个产出，顺序与 os.walk 相同，跳过隐藏目录）
     参数:
         directory: 目录路径
     返回:
-        EPUB文件路径列表
+        EPUB文件路径的迭代器
     """
-    epub_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith('.epub'):
-                epub_files.append(os.path.join(root, file))
-    return epub_files
+    # os.scandir 的目录项自带文件类型，不必对每个文件再调用一次 stat
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            # 与 os.walk 一样跳过无法读取的目录
+            continue
+        
+        sub_dirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # 跳过隐藏目录（.git、.calibre 等元数据目录里没有要转换的书）
+                if not entry.name.startswith('.'):
+                    sub_dirs.append(entry.path)
+            elif entry.name[-5:].lower() == _EPUB_SUFFIX and entry.is_file():
+                yield entry.path
+        
+        # 倒序入栈，按目录原有顺序依次遍历子目录
+        stack.extend(reversed(sub_dirs))
 
 
-def batch_convert(epub_files: list, output_dir: str = None, split_files: bool = True):
+def _init_worker(parallel_documents: bool = False):
     """
-    批量转换EPUB文件为TXT
+    工作进程初始化：创建进程内共用的解析器和分割器，跨文件复用
     参数:
-        epub_files: EPUB文件路径列表
-        output_dir: 输出目录，如果为None则使用输入文件所在目录
-        split_files: 是否根据字数分割文件
+        parallel_documents: 解析器是否用进程池并行解析大书（工作进程中关闭，避免嵌套进程池）
+    """
+    global _PARSER, _SPLITTER
+    _PARSER = EpubParser(parallel_documents=parallel_documents)
+    _SPLITTER = TextSplitter()
+
+
+def _init_thread_worker():
+    """工作线程初始化：为当前线程创建解析器和分割器，跨文件复用（已按文件并行，不再为单本书开进程池）"""
+    _thread_instances.parser = EpubParser(parallel_documents=False)
+    _thread_instances.splitter = TextSplitter()
+
+
+def _worker_instances() -> tuple:
+    """
+    获取当前工作线程或进程使用的解析器和分割器
+    返回:
+        (解析器, 分割器)
+    """
+    parser = getattr(_thread_instances, 'parser', None)
+    if parser is not None:
+        return parser, _thread_instances.splitter
+    if _PARSER is None:
+        # 在主进程中逐个转换时，大书仍可用进程池并行解析
+        _init_worker(parallel_documents=True)
+    return _PARSER, _SPLITTER
+
+
+class _ThreadLocalStdout:
+    """
+    按线程分发的标准输出
+    某个线程正在收集输出时写入该线程的缓冲区，否则写入原来的标准输出
     """
-    parser = EpubParser()
-    splitter = TextSplitter()
     
-    total_files = len(epub_files)
-    print(f"找到 {total_files} 个EPUB文件\n")
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
     
-    success_count = 0
-    fail_count = 0
+    def _target(self):
+        buffer = getattr(self.local, 'buffer', None)
+        return self.stream if buffer is None else buffer
     
-    for idx, epub_file in enumerate(epub_files, 1):
-        print(f"[{idx}/{total_files}] 处理: {os.path.basename(epub_file)}")
-        
+    def write(self, text):
+        return self._target().write(text)
+    
+    def flush(self):
+        self._target().flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def _thread_local_stdout():
+    """在 with 块内把标准输出换成按线程分发的版本，供多个线程分别收集输出"""
+    original = sys.stdout
+    sys.stdout = _ThreadLocalStdout(original)
+    try:
+        yield
+    finally:
+        sys.stdout = original
+
+
+@contextlib.contextmanager
+def _capture_output():
+    """
+    收集当前线程在 with 块内输出的内容
+    返回:
+        收集输出的 StringIO
+    """
+    stdout = sys.stdout
+    buf = io.StringIO()
+    if not isinstance(stdout, _ThreadLocalStdout):
+        # 单线程（如工作进程）直接替换标准输出
+        with contextlib.redirect_stdout(buf):
+            yield buf
+        return
+    
+    stdout.local.buffer = buf
+    try:
+        yield buf
+    finally:
+        stdout.local.buffer = None
+
+
+def _is_valid_epub(epub_path: str) -> bool:
+    """
+    快速检查文件是否可能是EPUB（只读取ZIP的中央目录和 mimetype 条目）
+    没有 mimetype 条目的文件仍交给解析器处理（ebooklib 能读取不少这样的文件）
+    参数:
+        epub_path: EPUB文件路径
+    返回:
+        是否值得继续解析
+    """
+    try:
+        with zipfile.ZipFile(epub_path) as zf:
+            try:
+                mimetype = zf.read('mimetype')
+            except KeyError:
+                return True
+            return mimetype.strip() == b'application/epub+zip'
+    except Exception:
+        return False
+
+
+def _extract_one(epub_file: str, use_cache: bool = True) -> tuple:
+    """
+    提取单个EPUB文件的章节（转换的第一阶段，可在预读线程中执行）
+    参数:
+        epub_file: EPUB文件路径
+        use_cache: 是否使用章节缓存
+    返回:
+        (章节列表, 输出内容, 异常)，提取失败时章节列表为None
+    """
+    parser = _worker_instances()[0]
+    
+    # 先用很小的代价排除不是ZIP的文件，不必等完整解析失败
+    if not _is_valid_epub(epub_file):
+        return None, '', ValueError("不是有效的EPUB文件（无法读取ZIP或 mimetype 不是 application/epub+zip）")
+    
+    with _capture_output() as buf:
         try:
-            # 确定输出目录
-            if output_dir:
-                os.makedirs(output_dir, exist_ok=True)
-                base_name = os.path.splitext(os.path.basename(epub_file))[0]
-                txt_output = os.path.join(output_dir, f"{base_name}.txt")
-            else:
-                txt_output = None  # 使用默认路径（与epub同目录）
+            chapters = parser.extract_chapters(epub_file, use_cache=use_cache)
+        except Exception as e:
+            return None, buf.getvalue(), e
+    return chapters, buf.getvalue(), None
+
+
+def _convert_one(epub_file: str, output_dir: str, split_files: bool, extracted: tuple = None,
+                 base_name: str = None, use_cache: bool = True) -> tuple:
+    """
+    转换单个EPUB文件（模块级函数，供进程池调用）
+    转换过程中的输出先收集起来随结果一并返回，避免多个进程的输出交错
+    参数:
+        epub_file: EPUB文件路径
+        output_dir: 输出目录（由 batch_convert 事先创建），如果为None则使用输入文件所在目录
+        split_files: 是否根据字数分割文件
+        extracted: 已提取好的 _extract_one 结果（为None时在这里提取）
+        base_name: 输出文件名（不含扩展名），为None时使用EPUB文件名
+        use_cache: 是否使用章节缓存（在这里提取时）
+    返回:
+        (是否成功, 输出内容, 字数, 章节数)，未统计字数（不分割）时字数为None
+    """
+    if extracted is None:
+        extracted = _extract_one(epub_file, use_cache)
+    chapters, extract_output, error = extracted
+    splitter = _worker_instances()[1]
+    
+    with _capture_output() as buf:
+        try:
+            if error is not None:
+                raise error
             
-            # 提取章节信息
-            chapters = parser.extract_chapters(epub_file)
+            # 确定输出目录（未指定时使用与epub同目录），文件名只计算一次
+            source_dir, file_name = os.path.split(epub_file)
+            if base_name is None:
+                base_name = os.path.splitext(file_name)[0]
+            target_dir = output_dir or source_dir
+            txt_name = f"{base_name}.txt"
+            txt_output = os.path.join(target_dir, txt_name)
             
             if not chapters:
                 print(f"  ✗ 无法提取章节信息")
-                fail_count += 1
-                continue
+                return False, extract_output + buf.getvalue(), 0, 0
             
-            # 统计总字数（只统计章节内容，不包括标题）
-            total_words = sum(splitter.count_content_words(ch['content']) for ch in chapters)
+            total_words = None
             
             # 如果需要分割
             if split_files:
+                # 统计每章和总字数（只统计章节内容，不包括标题），切分时复用每章字数
+                chapter_words = [splitter.count_content_words(ch['content']) for ch in chapters]
+                total_words = sum(chapter_words)
                 split_count = splitter.calculate_split_count(total_words)
                 
                 if split_count > 1:
                     # 需要分割（使用新规则：按8万字在章节边界切分）
-                    chapter_groups = splitter.split_by_word_count_at_chapter_boundary(chapters)
+                    chapter_groups = splitter.split_by_word_count_at_chapter_boundary(chapters, chapter_words)
                     
-                    # 确定输出目录
-                    if output_dir:
-                        output_dir_for_split = output_dir
-                    else:
-                        output_dir_for_split = os.path.dirname(epub_file)
+                    # 分割后的文件名（路径前缀只拼接一次）
+                    part_prefix = os.path.join(target_dir, f"{base_name}_part")
+                    split_files_list = [f"{part_prefix}{i:02d}.txt" for i in range(1, len(chapter_groups) + 1)]
                     
-                    base_name = os.path.splitext(os.path.basename(epub_file))[0]
-                    split_files_list = []
-                    
-                    # 生成分割后的文件
-                    for i, group in enumerate(chapter_groups):
-                        output_filename = f"{base_name}_part{i+1:02d}.txt"
-                        output_path = os.path.join(output_dir_for_split, output_filename)
-                        splitter.write_chapters_to_file(group, output_path)
-                        split_files_list.append(output_path)
-                    
-                    # 合并字数过小的相邻文件（启用调试日志）
-                    merged_files = splitter.merge_small_files(split_files_list, debug=True)
+                    # 在内存中合并字数过小的相邻部分，只写出合并后的文件（启用调试日志）
+                    merged_files = splitter.merge_small_groups(chapter_groups, split_files_list, debug=True)
                     
                     print(f"  ✓ 转换完成，已分割为 {len(split_files_list)} 个文件")
                     if len(merged_files) < len(split_files_list):
                         print(f"  ✓ 合并后为 {len(merged_files)} 个文件（合并了 {len(split_files_list) - len(merged_files)} 个文件）")
                     print(f"    字数: {total_words:,}，章节数: {len(chapters)}")
                 else:
-                    # 不需要分割，直接生成TXT文件
-                    txt_file = parser.convert_to_txt(epub_file, txt_output)
-                    print(f"  ✓ 转换完成: {os.path.basename(txt_file)}")
+                    # 不需要分割，直接生成TXT文件（与 convert_to_txt 写出相同的内容，但直接使用已提取的章节）
+                    splitter.write_chapters_to_file(chapters, txt_output)
+                    print(f"  ✓ 转换完成: {txt_name}")
                     print(f"    字数: {total_words:,}，章节数: {len(chapters)}，无需分割")
             else:
-                # 不分割，直接转换
-                txt_file = parser.convert_to_txt(epub_file, txt_output)
-                print(f"  ✓ 转换完成: {os.path.basename(txt_file)}")
-                print(f"    字数: {total_words:,}，章节数: {len(chapters)}")
+                # 不分割，直接转换（字数只用于决定分割，不分割时不再为显示字数遍历全部内容）
+                splitter.write_chapters_to_file(chapters, txt_output)
+                print(f"  ✓ 转换完成: {txt_name}")
+                print(f"    章节数: {len(chapters)}")
             
-            success_count += 1
+            return True, extract_output + buf.getvalue(), total_words, len(chapters)
         
         except Exception as e:
             print(f"  ✗ 处理失败: {e}")
-            fail_count += 1
+            return False, extract_output + buf.getvalue(), 0, 0
+
+
+def _file_size(file_path: str) -> int:
+    """获取文件大小，无法访问时返回0"""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _convert_parallel(epub_files: list, base_names: list, output_dir: str, split_files: bool,
+                      workers: int, executor_type: str = 'process', use_cache: bool = True) -> Iterator[tuple]:
+    """
+    在进程池或线程池中并行转换，按完成顺序产出结果
+    参数:
+        epub_files: EPUB文件路径列表
+        base_names: 每个文件的输出文件名（不含扩展名）
+        output_dir: 输出目录
+        split_files: 是否根据字数分割文件
+        workers: 工作进程（线程）数
+        executor_type: 'process' 使用进程池，'thread' 使用线程池（不需要在进程间传递结果，
+            lxml 解析时会释放GIL，适合读取慢的存储，如网络盘）
+        use_cache: 是否使用章节缓存
+    返回:
+        (文件路径, 是否成功, 输出内容, 字数, 章节数) 的迭代器
+    """
+    # 大文件先提交（最长处理时间优先），避免最后才开始的大文件拖长总耗时
+    jobs = sorted(zip(epub_files, base_names), key=lambda job: _file_size(job[0]), reverse=True)
+    
+    if executor_type == 'thread':
+        # 各线程分别收集自己的输出
+        executor = ThreadPoolExecutor(max_workers=workers, initializer=_init_thread_worker)
+        output_context = _thread_local_stdout()
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        output_context = contextlib.nullcontext()
+    
+    with output_context:
+        try:
+            futures = {executor.submit(_convert_one, f, output_dir, split_files, None, b, use_cache): f for f, b in jobs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = (False, f"  ✗ 处理失败: {e}\n", 0, 0)
+                yield (futures[future],) + result
+        finally:
+            # 中断（如 Ctrl-C）时取消尚未开始的文件，并等待正在转换的文件结束，
+            # batch_convert 返回后不再有工作进程或线程写入输出；正常结束时所有任务都已完成，不需要等待
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _convert_pipelined(epub_files: list, base_names: list, output_dir: str, split_files: bool,
+                       use_cache: bool = True) -> Iterator[tuple]:
+    """
+    在本进程中按顺序转换：预读线程提前提取后面几个文件的章节（读取ZIP、解析XML），
+    本线程同时统计、分割、写入前面的文件
+    参数:
+        epub_files: EPUB文件路径列表
+        base_names: 每个文件的输出文件名（不含扩展名）
+        output_dir: 输出目录
+        split_files: 是否根据字数分割文件
+        use_cache: 是否使用章节缓存
+    返回:
+        (文件路径, 是否成功, 输出内容, 字数, 章节数) 的迭代器
+    """
+    # 先在本线程创建解析器和分割器，预读线程与本线程共用
+    _worker_instances()
+    
+    # 只用一个预读线程，解析器的缓存不会被多个线程同时修改；最多提前 PREFETCH_FILES 个文件，内存占用有上限
+    with _thread_local_stdout(), ThreadPoolExecutor(max_workers=1) as io_pool:
+        pending = deque()
+        next_idx = 0
+        try:
+            for epub_file, base_name in zip(epub_files, base_names):
+                while next_idx < len(epub_files) and len(pending) < PREFETCH_FILES:
+                    pending.append(io_pool.submit(_extract_one, epub_files[next_idx], use_cache))
+                    next_idx += 1
+                
+                result = _convert_one(epub_file, output_dir, split_files, pending.popleft().result(), base_name)
+                yield (epub_file,) + result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _output_base_names(epub_files: list, output_dir: str = None) -> list:
+    """
+    确定每个文件的输出文件名（不含扩展名）
+    多个EPUB会输出到同一目录下的同名文件时（如 -d 扫描到不同子目录中的同名书），
+    第一个保留原名，其余在文件名后加上由文件路径生成的短哈希
+    参数:
+        epub_files: EPUB文件路径列表
+        output_dir: 输出目录，如果为None则使用输入文件所在目录
+    返回:
+        与 epub_files 一一对应的输出文件名列表
+    """
+    base_names = []
+    used = set()
+    for epub_file in epub_files:
+        source_dir, file_name = os.path.split(epub_file)
+        base_name = os.path.splitext(file_name)[0]
+        target_dir = output_dir or source_dir
         
-        print()
+        if (target_dir, base_name) in used:
+            digest = hashlib.sha1(os.path.abspath(epub_file).encode('utf-8', 'surrogatepass')).hexdigest()
+            new_name = f"{base_name}_{digest[:8]}"
+            # 同一个文件被指定了多次时哈希也相同，再加序号区分
+            suffix = 2
+            while (target_dir, new_name) in used:
+                new_name = f"{base_name}_{digest[:8]}_{suffix}"
+                suffix += 1
+            print(f"警告: 输出文件名重复，{epub_file} 将输出为 {new_name}.txt")
+            base_name = new_name
+        
+        used.add((target_dir, base_name))
+        base_names.append(base_name)
+    return base_names
+
+
+def batch_convert(epub_files: list, output_dir: str = None, split_files: bool = True, jobs: int = None,
+                  executor_type: str = 'process', use_cache: bool = True):
+    """
+    批量转换EPUB文件为TXT（多个文件时在进程池或线程池中并行转换）
+    参数:
+        epub_files: EPUB文件路径列表
+        output_dir: 输出目录，如果为None则使用输入文件所在目录
+        split_files: 是否根据字数分割文件
+        jobs: 同时转换的文件数，如果为None则使用CPU核数
+        executor_type: 并行方式，'process'（多进程）或 'thread'（多线程）
+        use_cache: 是否使用章节缓存（为False时每本书都重新提取，也不写入缓存）
+    """
+    if executor_type not in EXECUTORS:
+        raise ValueError(f"不支持的并行方式: {executor_type}，可选: {', '.join(EXECUTORS)}")
+    
+    total_files = len(epub_files)
+    print(f"找到 {total_files} 个EPUB文件\n")
+    
+    success_count = 0
+    fail_count = 0
+    
+    # 输出目录只需创建一次（创建失败时各文件写入会失败并计入失败数）
+    if output_dir:
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            print(f"错误: 无法创建输出目录 {output_dir}: {e}")
+    
+    # 转换前先处理输出文件名重复的情况，避免先转换完的文件被后面的文件覆盖
+    base_names = _output_base_names(epub_files, output_dir)
+    
+    # 每个文件的解析、分割、写入互不相关，默认按CPU核数并行（按完成顺序输出）；
+    # 只有一个工作进程时在本进程按顺序转换，读取解析与写入交叠进行
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    workers = min(total_files, max(jobs, 1))
+    if workers > 1:
+        results = _convert_parallel(epub_files, base_names, output_dir, split_files, workers, executor_type,
+                                    use_cache)
+    else:
+        results = _convert_pipelined(epub_files, base_names, output_dir, split_files, use_cache)
+    
+    # 成功转换的文件顺带累计总字数和总章节数，不需要再统计输出文件
+    batch_words = 0
+    batch_chapters = 0
+    
+    for idx, (epub_file, ok, output, words, chapter_count) in enumerate(results, 1):
+        # 每个文件的进度和收集到的输出拼成一段，一次写出并刷新
+        sys.stdout.write(f"[{idx}/{total_files}] 处理: {os.path.basename(epub_file)}\n{output}\n")
+        sys.stdout.flush()
+        if ok:
+            success_count += 1
+            batch_chapters += chapter_count
+            if words is not None:
+                batch_words += words
+        else:
+            fail_count += 1
     
     # 统计信息
     print("=" * 60)
     print(f"处理完成!")
     print(f"成功: {success_count} 个")
     print(f"失败: {fail_count} 个")
+    print(f"总章节数: {batch_chapters:,}")
+    if split_files:
+        print(f"总字数: {batch_words:,}")
     print("=" * 60)
 
 
 def main():
     """主函数"""
+    # 只有命令行运行时才需要 argparse，作为模块导入（如工作进程）时不加载
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description='EPUB转TXT批量转换工具',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -144,6 +484,12 @@ def main():
 
   # 不分割文件（只转换，不分割）
   python main.py --no-split
+
+  # 同时转换4个文件，使用多线程（适合网络盘）
+  python main.py -d /path/to/epub/files -j 4 --executor thread
+
+  # 不使用章节缓存（修改章节识别规则后重新提取）
+  python main.py -d /path/to/epub/files --no-cache
         """
     )
     
@@ -171,15 +517,39 @@ def main():
         help='不分割文件（只转换，不根据字数分割）'
     )
     
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='同时转换的文件数（默认为CPU核数）'
+    )
+    
+    parser.add_argument(
+        '--executor',
+        choices=EXECUTORS,
+        default='process',
+        help='并行方式：process 多进程（默认），thread 多线程（适合网络盘等读取慢的存储）'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='不使用章节缓存（每本书都重新提取章节，也不写入缓存）'
+    )
+    
     args = parser.parse_args()
     
+    if args.jobs is not None and args.jobs < 1:
+        print(f"错误: --jobs 必须大于0: {args.jobs}")
+        sys.exit(1)
+    
     # 收集EPUB文件
     epub_files = []
     
     if args.files:
         # 使用指定的文件
+        # 先比较扩展名（不需要系统调用），再用一次 stat 确认是文件
         for file_path in args.files:
-            if os.path.exists(file_path) and file_path.lower().endswith('.epub'):
+            if file_path[-5:].lower() == _EPUB_SUFFIX and os.path.isfile(file_path):
                 epub_files.append(file_path)
             else:
                 print(f"警告: 文件不存在或不是EPUB格式: {file_path}")
@@ -187,7 +557,7 @@ def main():
     elif args.directory:
         # 从指定目录查找
         if os.path.isdir(args.directory):
-            epub_files = find_epub_files(args.directory)
+            epub_files = list(find_epub_files(args.directory))
         else:
             print(f"错误: 目录不存在: {args.directory}")
             sys.exit(1)
@@ -196,14 +566,15 @@ def main():
         # 默认使用当前目录
         current_dir = os.getcwd()
         print(f"未指定目录或文件，使用当前目录: {current_dir}")
-        epub_files = find_epub_files(current_dir)
+        epub_files = list(find_epub_files(current_dir))
     
     if not epub_files:
         print("错误: 未找到任何EPUB文件")
         sys.exit(1)
     
     # 执行批量转换
-    batch_convert(epub_files, args.output, split_files=not args.no_split)
+    batch_convert(epub_files, args.output, split_files=not args.no_split, jobs=args.jobs,
+                  executor_type=args.executor, use_cache=not args.no_cache)
 
 
 if __name__ == '__main__':
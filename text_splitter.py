@@ -3,7 +3,190 @@
 根据字数统计和分割规则，将文本分割成多个文件
 """
 import os
-from typing import List, Dict, Optional
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
+
+
+# 合并文件时每次复制的字符数
+MERGE_COPY_BUFFER = 1 << 20
+# 统计文件字数时每批读取的字符数（按整行读取，约为此大小）
+COUNT_READ_HINT = 1 << 20
+# 合并前并行读取文件时的最大线程数
+MAX_READ_THREADS = 8
+# str.isspace() 为真的全部ASCII字符（包括 \x1c-\x1f），用于纯ASCII文本的快速字数统计
+_ASCII_WHITESPACE = bytes(c for c in range(128) if chr(c).isspace())
+# 输出文件中章节标题下的分隔线
+SEPARATOR_LINE = "=" * 50
+
+
+def _read_text_file(file_path: str) -> str:
+    """按文本模式（UTF-8）读取整个文件"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _part_number(file_path: str) -> Optional[int]:
+    """
+    解析分割文件名中 _part 之后的编号（如 book_part03.txt -> 3）
+    参数:
+        file_path: 文件路径
+    返回:
+        编号；没有 _part 或编号不是整数（如已合并的 book_part01-03.txt）时返回 None
+    """
+    _, sep, tail = os.path.basename(file_path).partition('_part')
+    if not sep:
+        return None
+    try:
+        return int(tail.split('_part', 1)[0].split('.', 1)[0])
+    except ValueError:
+        return None
+
+
+def _read_text_newlines(text: str) -> str:
+    """按文本模式读取文件时的换行规则统一换行符（\r\n 和 \r 都变成 \n）"""
+    if '\r' not in text:
+        return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class _DiskFiles:
+    """合并文件时直接读写磁盘上的文件"""
+    
+    def __init__(self, splitter):
+        self.splitter = splitter
+        # 已统计过的文件字数 {文件路径: 字数}，文件被合并（改写或删除）时失效
+        self.word_counts = {}
+        # 各目录下的文件名集合 {目录: 文件名集合}，每个目录只列一次，合并时同步更新
+        self.dir_names = {}
+    
+    def _names_in(self, directory: str) -> set:
+        names = self.dir_names.get(directory)
+        if names is None:
+            try:
+                names = set(os.listdir(directory or '.'))
+            except OSError:
+                names = set()
+            self.dir_names[directory] = names
+        return names
+    
+    def exists(self, file_path: str) -> bool:
+        # 用目录列表判断文件是否存在，避免合并过程中对每个文件反复 stat
+        directory, name = os.path.split(file_path)
+        return name in self._names_in(directory)
+    
+    def count_words(self, file_path: str) -> int:
+        # 每轮合并都会重新统计全部文件，没有变化的文件直接使用上次的结果，不再重新读取
+        words = self.word_counts.get(file_path)
+        if words is None:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except Exception as e:
+                # 读取失败时不缓存，与 count_words_in_file 一样每次都输出错误
+                print(f"读取文件失败 {file_path}: {e}")
+                return 0
+            words = self.splitter.count_words_in_text(text)
+            self.word_counts[file_path] = words
+        return words
+    
+    def merge(self, file_paths: List[str], merged_file_path: str):
+        """
+        把多个文件的内容合并写入 merged_file_path，并删除原始文件
+        参数:
+            file_paths: 要合并的文件路径列表
+            merged_file_path: 合并后的文件路径
+        """
+        # 合并后的文件也是输入之一时先写到临时文件，避免打开时把它清空
+        write_path = merged_file_path + '.tmp' if merged_file_path in file_paths else merged_file_path
+        
+        # 逐个文件分块复制到合并后的文件，不把全部内容读入内存
+        # 按文本模式读取（统一换行符），写入时不再转换换行符，结果与读入后 '\n'.join 写出相同
+        with open(write_path, 'w', encoding='utf-8', newline='') as dst:
+            first = True
+            for file_path in file_paths:
+                pos = dst.tell()
+                try:
+                    with open(file_path, 'r', encoding='utf-8', buffering=1 << 20) as src:
+                        if not first:
+                            dst.write('\n')
+                        shutil.copyfileobj(src, dst, MERGE_COPY_BUFFER)
+                    first = False
+                except Exception as e:
+                    # 读取失败的文件整个跳过，撤销已写入的部分
+                    dst.seek(pos)
+                    dst.truncate()
+                    print(f"读取文件失败 {file_path}: {e}")
+        if write_path != merged_file_path:
+            os.replace(write_path, merged_file_path)
+        directory, name = os.path.split(merged_file_path)
+        self._names_in(directory).add(name)
+        
+        # 删除原始文件
+        for file_path in file_paths:
+            self.word_counts.pop(file_path, None)
+            try:
+                if file_path != merged_file_path and self.exists(file_path):
+                    os.remove(file_path)
+                    directory, name = os.path.split(file_path)
+                    self._names_in(directory).discard(name)
+            except Exception as e:
+                print(f"删除文件失败 {file_path}: {e}")
+        self.word_counts.pop(merged_file_path, None)
+
+
+class _MemoryFiles:
+    """
+    合并文件时只在内存中操作 {文件路径: 文本}，行为与 _DiskFiles 读写磁盘文件一致
+    合并结束后由调用方把剩下的文件写入磁盘
+    """
+    
+    def __init__(self, splitter, texts: Dict[str, str]):
+        self.splitter = splitter
+        self.texts = texts
+        # 合并过程中出现过的所有文件路径（用于清理磁盘上同名的中间文件）
+        self.all_paths = set(texts)
+        # 已统计过的文本字数 {文件路径: 字数}，文本被合并时失效
+        self.word_counts = {}
+    
+    def exists(self, file_path: str) -> bool:
+        return file_path in self.texts
+    
+    def count_words(self, file_path: str) -> int:
+        words = self.word_counts.get(file_path)
+        if words is None:
+            text = self.texts.get(file_path)
+            if text is None:
+                print(f"读取文件失败 {file_path}: 文件不存在")
+                return 0
+            words = self.splitter.count_words_in_text(text)
+            self.word_counts[file_path] = words
+        return words
+    
+    def merge(self, file_paths: List[str], merged_file_path: str):
+        """
+        把多个文本合并为 merged_file_path，并移除原始文本
+        参数:
+            file_paths: 要合并的文件路径列表
+            merged_file_path: 合并后的文件路径
+        """
+        all_content = []
+        for file_path in file_paths:
+            text = self.texts.get(file_path)
+            if text is None:
+                print(f"读取文件失败 {file_path}: 文件不存在")
+                continue
+            # 磁盘上合并时是按文本模式读回的，换行符会被统一
+            all_content.append(_read_text_newlines(text))
+        
+        self.texts[merged_file_path] = '\n'.join(all_content)
+        self.all_paths.add(merged_file_path)
+        self.word_counts.pop(merged_file_path, None)
+        
+        for file_path in file_paths:
+            if file_path != merged_file_path:
+                self.texts.pop(file_path, None)
+                self.word_counts.pop(file_path, None)
 
 
 class TextSplitter:
@@ -29,7 +212,14 @@ class TextSplitter:
         # 移除章节标题和分隔线等格式内容
         # 统计所有非空白字符（包括中文、英文、数字、标点等）
         # 但不包括换行符、制表符等空白字符
-        total_chars = len([c for c in text if not c.isspace()])
+        # 纯ASCII文本（如英文章节）编码为字节后直接删除空白字节，比按空白切分再拼接更快
+        # （str.isascii() 是O(1)的标志位检查，中文文本不受影响）
+        if text.isascii():
+            return len(text.encode('ascii').translate(None, _ASCII_WHITESPACE))
+        
+        # str.split() 按与 str.isspace() 相同的空白字符切分，拼接后的长度即非空白字符数，
+        # 全部在C层完成，不再为每个字符生成一个列表元素
+        total_chars = len(''.join(text.split()))
         
         return total_chars
     
@@ -57,33 +247,60 @@ class TextSplitter:
             字数
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 过滤掉章节标题和分隔线
-            content_lines = []
+            # 按行分批读取并统计，不把整个文件读入内存
+            words = 0
             skip_next = False
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                # 跳过分隔线
-                if line.startswith('=') and len(line) >= 20:
-                    skip_next = True
-                    continue
-                # 跳过章节标题（如果上一行是分隔线）
-                if skip_next:
-                    skip_next = False
-                    continue
-                content_lines.append(line)
-            
-            # 统计内容字数
-            text = '\n'.join(content_lines)
-            return self.count_words(text)
+            with open(file_path, 'r', encoding='utf-8', buffering=1 << 20) as f:
+                for lines in iter(lambda: f.readlines(COUNT_READ_HINT), []):
+                    batch_words, skip_next = self._count_output_words(''.join(lines), skip_next)
+                    words += batch_words
+            return words
         except Exception as e:
             print(f"读取文件失败 {file_path}: {e}")
             return 0
     
+    def count_words_in_text(self, text: str) -> int:
+        """
+        统计输出文件内容的字数，与 count_words_in_file 读取该内容后的统计结果一致
+        参数:
+            text: 输出文件的完整文本
+        返回:
+            字数
+        """
+        return self._count_output_words(text, False)[0]
+    
+    def _count_output_words(self, text: str, skip_next: bool) -> Tuple[int, bool]:
+        """
+        统计输出文件中一段完整行的字数（可分段调用，跨段保持"跳过分隔线后一行"的状态）
+        参数:
+            text: 以换行结尾（或位于文件末尾）的一段文本
+            skip_next: 上一段结束时是否需要跳过下一个非空行
+        返回:
+            (字数, 本段结束时的 skip_next 状态)
+        """
+        # 按文本模式读取文件时的换行规则切分行
+        lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        
+        # 过滤掉章节标题和分隔线
+        content_lines = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            # 跳过分隔线
+            if line.startswith('=') and len(line) >= 20:
+                skip_next = True
+                continue
+            # 跳过章节标题（如果上一行是分隔线）
+            if skip_next:
+                skip_next = False
+                continue
+            content_lines.append(line)
+        
+        # 统计内容字数
+        text = '\n'.join(content_lines)
+        return self.count_words(text), skip_next
+    
     def calculate_split_count(self, word_count: int) -> int:
         """
         根据字数计算需要分割的份数
@@ -92,19 +309,17 @@ class TextSplitter:
         返回:
             分割份数（至少为1）
         """
-        if word_count < self.WORDS_PER_PART:
-            return 1
-        
-        # 每8万字增加一份
-        parts = (word_count // self.WORDS_PER_PART) + 1
-        return parts
+        # 每8万字一份，向上取整（正好是8万字整数倍时不多算一份）
+        return max(1, -(-word_count // self.WORDS_PER_PART))
     
-    def split_by_chapters(self, chapters: List[Dict], split_count: int) -> List[List[Dict]]:
+    def split_by_chapters(self, chapters: List[Dict], split_count: int,
+                          chapter_words: Optional[List[int]] = None) -> List[List[Dict]]:
         """
         按照章节分割文本（新规则：按8万字切分，切分点必须在章节边界）
         参数:
             chapters: 章节列表，每个章节包含 {'title': 标题, 'content': 内容行列表}
             split_count: 分割份数（用于兼容旧代码，实际不使用）
+            chapter_words: 可选的每章字数列表（与 count_content_words 结果一致），已统计过时传入，避免重复统计
         返回:
             分割后的章节组列表
         """
@@ -117,25 +332,27 @@ class TextSplitter:
         current_words = 0
         target_words = self.WORDS_PER_PART  # 8万字
         
-        for chapter in chapters:
-            chapter_content = '\n'.join(chapter['content'])
-            chapter_words = self.count_words(chapter_content)
+        for chapter_idx, chapter in enumerate(chapters):
+            if chapter_words is not None:
+                words = chapter_words[chapter_idx]
+            else:
+                words = self.count_words('\n'.join(chapter['content']))
             
             # 如果当前累计字数加上本章字数会超过目标字数
-            if current_words + chapter_words > target_words and current_chapters:
+            if current_words + words > target_words and current_chapters:
                 # 需要切分
                 # 检查当前累计字数是否接近目标（允许一定误差）
                 if current_words >= target_words * 0.7:  # 至少达到目标的70%
                     # 保存当前部分
-                    result.append(current_chapters.copy())
+                    result.append(current_chapters)
                     current_chapters = []
                     current_words = 0
                 
                 # 如果单个章节就超过目标字数，也要切分
-                if chapter_words > target_words:
+                if words > target_words:
                     # 如果当前有未保存的章节，先保存
                     if current_chapters:
-                        result.append(current_chapters.copy())
+                        result.append(current_chapters)
                         current_chapters = []
                         current_words = 0
                     # 这个章节单独成一份
@@ -144,7 +361,7 @@ class TextSplitter:
             
             # 添加当前章节
             current_chapters.append(chapter)
-            current_words += chapter_words
+            current_words += words
         
         # 保存最后的部分
         if current_chapters:
@@ -152,12 +369,14 @@ class TextSplitter:
         
         return result
     
-    def split_by_word_count_at_chapter_boundary(self, chapters: List[Dict]) -> List[List[Dict]]:
+    def split_by_word_count_at_chapter_boundary(self, chapters: List[Dict],
+                                                chapter_words: Optional[List[int]] = None) -> List[List[Dict]]:
         """
         按照字数在章节边界切分（新规则）
         从开头开始，每8万字找一个最近的章节边界作为切分点
         参数:
             chapters: 章节列表，每个章节包含 {'title': 标题, 'content': 内容行列表}
+            chapter_words: 可选的每章字数列表（与 count_content_words 结果一致），已统计过时传入，避免重复统计
         返回:
             分割后的章节组列表
         """
@@ -172,11 +391,13 @@ class TextSplitter:
         
         while chapter_idx < len(chapters):
             chapter = chapters[chapter_idx]
-            chapter_content = '\n'.join(chapter['content'])
-            chapter_words = self.count_words(chapter_content)
+            if chapter_words is not None:
+                words = chapter_words[chapter_idx]
+            else:
+                words = self.count_words('\n'.join(chapter['content']))
             
             # 累计字数
-            new_total_words = current_words + chapter_words
+            new_total_words = current_words + words
             
             # 如果累计字数达到或超过目标字数
             if new_total_words >= target_words:
@@ -196,14 +417,14 @@ class TextSplitter:
                 # 选择更接近目标字数的章节边界
                 if dist_to_target_before <= dist_to_target_after and current_chapters:
                     # 向前切分：在当前章节之前切分
-                    result.append(current_chapters.copy())
+                    result.append(current_chapters)
                     current_chapters = [chapter]
-                    current_words = chapter_words
+                    current_words = words
                     chapter_idx += 1
                 else:
                     # 向后切分：包含当前章节，然后切分
                     current_chapters.append(chapter)
-                    result.append(current_chapters.copy())
+                    result.append(current_chapters)
                     current_chapters = []
                     current_words = 0
                     chapter_idx += 1
@@ -219,22 +440,48 @@ class TextSplitter:
         
         return result
     
-    def write_chapters_to_file(self, chapters: List[Dict], output_path: str):
+    @staticmethod
+    def _chapter_text(chapter: Dict) -> str:
+        """
+        生成一个章节在输出文件中的文本
+        参数:
+            chapter: 章节 {'title': 标题, 'content': 内容行列表}
+        返回:
+            章节标题、分隔线、章节内容（每行以换行结尾）、章节间空行拼接成的文本
+        """
+        content = chapter['content']
+        return ''.join((
+            f"\n{chapter['title']}\n{SEPARATOR_LINE}\n\n",
+            '\n'.join(content),
+            "\n\n" if content else "\n"
+        ))
+    
+    def write_chapters_to_file(self, chapters: List[Dict], output_path: str) -> int:
         """
-        将章节列表写入文件
+        将章节列表写入文件（UTF-8，换行符统一为 \n）
+        逐章拼接、编码后写入缓冲文件并顺带统计字数，不在内存中拼出整个文件的文本
         参数:
             chapters: 章节列表
             output_path: 输出文件路径
+        返回:
+            写入内容的字数（与之后 count_words_in_file 统计该文件的结果一致）
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
+        total_words = 0
+        skip_next = False
+        
+        # 二进制模式写入自行编码好的整章数据，不经过文本层的换行转换和逐次增量编码
+        with open(output_path, 'wb', buffering=1 << 20) as f:
             for chapter in chapters:
-                f.write(f"\n{chapter['title']}\n")
-                f.write("=" * 50 + "\n\n")
-                for line in chapter['content']:
-                    f.write(line + "\n")
-                f.write("\n")
+                text = self._chapter_text(chapter)
+                f.write(text.encode('utf-8'))
+                # 直接统计写入的文本，调用方无需再读取刚写入的文件
+                words, skip_next = self._count_output_words(text, skip_next)
+                total_words += words
+        
+        return total_words
     
-    def merge_small_files(self, file_list: List[str], min_words_per_file: int = None, debug: bool = False, log_callback=None) -> List[str]:
+    def merge_small_files(self, file_list: List[str], min_words_per_file: int = None, debug: bool = False, log_callback=None,
+                          word_counts: Optional[Dict[str, int]] = None) -> List[str]:
         """
         合并字数过小的相邻文件（递归合并）
         规则：
@@ -250,6 +497,91 @@ class TextSplitter:
             file_list: 文件路径列表（按顺序）
             min_words_per_file: 每个文件的最小字数阈值，默认10万字
             debug: 是否输出调试信息
+            word_counts: 可选的字典，合并结束后写入每个返回文件的字数 {文件路径: 字数}
+        返回:
+            合并后的文件路径列表
+        """
+        # 先一次性读入全部文件，在内存中合并，每个最终文件只写一次磁盘
+        disk = _DiskFiles(self)
+        existing = [file_path for file_path in file_list if disk.exists(file_path)]
+        try:
+            # 读取文件时会释放 GIL，多个文件用线程并行读取
+            if len(existing) > 1:
+                with ThreadPoolExecutor(max_workers=min(MAX_READ_THREADS, len(existing))) as executor:
+                    texts = dict(zip(existing, executor.map(_read_text_file, existing)))
+            else:
+                texts = {file_path: _read_text_file(file_path) for file_path in existing}
+        except Exception:
+            # 有文件读取失败时按原方式在磁盘上逐步合并，保持原有的错误输出
+            return self._merge_small(disk, file_list, min_words_per_file, debug, log_callback, word_counts)
+        
+        original_texts = dict(texts)
+        files = _MemoryFiles(self, texts)
+        final_files = self._merge_small(files, file_list, min_words_per_file, debug, log_callback, word_counts)
+        
+        for file_path in final_files:
+            text = files.texts.get(file_path)
+            # 不存在的文件和没有参与合并的原始文件保持不动
+            if text is not None and text is not original_texts.get(file_path):
+                with open(file_path, 'wb') as f:
+                    f.write(text.encode('utf-8'))
+        
+        # 删除被合并掉的原始文件和中间文件
+        final_set = set(final_files)
+        for file_path in files.all_paths - final_set:
+            try:
+                if disk.exists(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                print(f"删除文件失败 {file_path}: {e}")
+        
+        return final_files
+    
+    def merge_small_groups(self, chapter_groups: List[List[Dict]], output_paths: List[str], min_words_per_file: int = None,
+                           debug: bool = False, log_callback=None,
+                           word_counts: Optional[Dict[str, int]] = None) -> List[str]:
+        """
+        合并字数过小的相邻章节组，规则和结果与先写出各组再调用 merge_small_files 相同
+        合并在内存中进行，只把最终的文件写入磁盘，不再反复读写、删除中间文件
+        参数:
+            chapter_groups: 分割后的章节组列表（按顺序）
+            output_paths: 每个章节组对应的输出文件路径
+            min_words_per_file: 每个文件的最小字数阈值，默认10万字
+            debug: 是否输出调试信息
+            log_callback: 日志回调函数，用于将调试信息输出到GUI（可选）
+            word_counts: 可选的字典，合并结束后写入每个返回文件的字数 {文件路径: 字数}
+        返回:
+            合并后的文件路径列表
+        """
+        texts = {}
+        for group, output_path in zip(chapter_groups, output_paths):
+            texts[output_path] = ''.join(self._chapter_text(chapter) for chapter in group)
+        
+        files = _MemoryFiles(self, texts)
+        final_files = self._merge_small(files, list(output_paths), min_words_per_file, debug, log_callback, word_counts)
+        
+        for file_path in final_files:
+            with open(file_path, 'wb') as f:
+                f.write(files.texts[file_path].encode('utf-8'))
+        
+        # 与在磁盘上合并时一样，不留下被合并掉的中间文件（包括以前运行留下的同名文件）
+        final_set = set(final_files)
+        for file_path in files.all_paths - final_set:
+            try:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                print(f"删除文件失败 {file_path}: {e}")
+        
+        return final_files
+    
+    def _merge_small(self, files, file_list: List[str], min_words_per_file: Optional[int], debug: bool, log_callback,
+                     word_counts: Optional[Dict[str, int]]) -> List[str]:
+        """
+        合并字数过小的相邻文件（merge_small_files 和 merge_small_groups 共用的合并规则）
+        参数:
+            files: 文件存储（_DiskFiles 或 _MemoryFiles），提供 exists、count_words、merge
+            其余参数同 merge_small_files
         返回:
             合并后的文件路径列表
         """
@@ -257,6 +589,10 @@ class TextSplitter:
             min_words_per_file = 100000  # 10万字
         
         if len(file_list) <= 1:
+            if word_counts is not None:
+                for file_path in file_list:
+                    if file_path not in word_counts:
+                        word_counts[file_path] = files.count_words(file_path)
             return file_list
         
         SMALL_FILE_THRESHOLD = 10000  # 1万字
@@ -267,40 +603,47 @@ class TextSplitter:
         current_files = file_list.copy()
         
         # 辅助函数：同时输出到终端和GUI
+        # 调用处都先判断 debug，不输出调试信息时不再格式化消息
         def debug_log(msg):
             if debug:
                 print(msg)
                 if log_callback:
                     log_callback(msg + '\n')
         
-        debug_log(f"\n开始合并文件，共 {len(current_files)} 个文件")
+        if debug:
+            debug_log(f"\n开始合并文件，共 {len(current_files)} 个文件")
         
         while iteration < max_iterations:
             iteration += 1
             changed = False
             
-            debug_log(f"\n--- 第 {iteration} 轮合并 ---")
+            if debug:
+                debug_log(f"\n--- 第 {iteration} 轮合并 ---")
             
             # 统计当前文件的字数（只统计存在的文件）
             file_words = []
             for file_path in current_files:
                 # 验证文件是否存在（合并后可能已被删除）
-                if not os.path.exists(file_path):
-                    debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(file_path)}")
+                if not files.exists(file_path):
+                    if debug:
+                        debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(file_path)}")
                     continue
                 try:
-                    words = self.count_words_in_file(file_path)
+                    words = files.count_words(file_path)
                     file_words.append((file_path, words))
-                    debug_log(f"  文件: {os.path.basename(file_path)} = {words:,} 字")
+                    if debug:
+                        debug_log(f"  文件: {os.path.basename(file_path)} = {words:,} 字")
                 except Exception as e:
-                    debug_log(f"  错误: 读取文件失败 {file_path}: {e}")
+                    if debug:
+                        debug_log(f"  错误: 读取文件失败 {file_path}: {e}")
                     continue
             
             # 第一步：合并小于1万字的文件（找相邻的更小的文件合并）
             new_file_words = []
             i = 0
             
-            debug_log(f"\n规则2: 合并小于 {SMALL_FILE_THRESHOLD:,} 字的文件")
+            if debug:
+                debug_log(f"\n规则2: 合并小于 {SMALL_FILE_THRESHOLD:,} 字的文件")
             
             while i < len(file_words):
                 current_file, current_words = file_words[i]
@@ -308,7 +651,8 @@ class TextSplitter:
                 
                 # 如果当前文件小于1万字
                 if current_words < SMALL_FILE_THRESHOLD:
-                    debug_log(f"  发现小文件: {file_name} ({current_words:,} 字) < {SMALL_FILE_THRESHOLD:,} 字")
+                    if debug:
+                        debug_log(f"  发现小文件: {file_name} ({current_words:,} 字) < {SMALL_FILE_THRESHOLD:,} 字")
                     
                     # 找相邻的文件合并（优先选择更小的，如果没有更小的，合并到下一个）
                     merged = False
@@ -346,57 +690,64 @@ class TextSplitter:
                         # 合并到前一个文件
                         prev_name = os.path.basename(prev_file)
                         # 验证文件是否存在
-                        if not os.path.exists(prev_file) or not os.path.exists(current_file):
+                        if not files.exists(prev_file) or not files.exists(current_file):
                             missing = []
-                            if not os.path.exists(prev_file):
+                            if not files.exists(prev_file):
                                 missing.append(prev_name)
-                            if not os.path.exists(current_file):
+                            if not files.exists(current_file):
                                 missing.append(file_name)
-                            debug_log(f"    ⚠ 文件不存在，跳过合并: {', '.join(missing)}")
+                            if debug:
+                                debug_log(f"    ⚠ 文件不存在，跳过合并: {', '.join(missing)}")
                             # 如果当前文件存在，保留它
-                            if os.path.exists(current_file):
+                            if files.exists(current_file):
                                 new_file_words.append((current_file, current_words))
                             i += 1
                             continue
                         
-                        debug_log(f"    → 合并到前一个文件 {prev_name} ({prev_words:,} 字)")
-                        merged_file_path = self._merge_files([prev_file, current_file], current_files[0] if current_files else None)
+                        if debug:
+                            debug_log(f"    → 合并到前一个文件 {prev_name} ({prev_words:,} 字)")
+                        merged_file_path = self._merge_files_with(files, [prev_file, current_file], current_files[0] if current_files else None)
                         merged_words = prev_words + current_words
                         # 替换前一个文件
                         new_file_words[-1] = (merged_file_path, merged_words)
                         merged = True
                         changed = True
-                        debug_log(f"    ✓ 合并后: {os.path.basename(merged_file_path)} ({merged_words:,} 字)")
+                        if debug:
+                            debug_log(f"    ✓ 合并后: {os.path.basename(merged_file_path)} ({merged_words:,} 字)")
                     
                     elif merge_to_next:
                         # 合并到当前文件（与下一个文件合并）
                         next_name = os.path.basename(next_file)
                         # 验证文件是否存在
-                        if not os.path.exists(current_file) or not os.path.exists(next_file):
+                        if not files.exists(current_file) or not files.exists(next_file):
                             missing = []
-                            if not os.path.exists(current_file):
+                            if not files.exists(current_file):
                                 missing.append(file_name)
-                            if not os.path.exists(next_file):
+                            if not files.exists(next_file):
                                 missing.append(next_name)
-                            debug_log(f"    ⚠ 文件不存在，跳过合并: {', '.join(missing)}")
+                            if debug:
+                                debug_log(f"    ⚠ 文件不存在，跳过合并: {', '.join(missing)}")
                             # 如果当前文件存在，保留它
-                            if os.path.exists(current_file):
+                            if files.exists(current_file):
                                 new_file_words.append((current_file, current_words))
                             i += 1
                             continue
                         
-                        debug_log(f"    → 合并到后一个文件 {next_name} ({next_words:,} 字)")
-                        merged_file_path = self._merge_files([current_file, next_file], current_files[0] if current_files else None)
+                        if debug:
+                            debug_log(f"    → 合并到后一个文件 {next_name} ({next_words:,} 字)")
+                        merged_file_path = self._merge_files_with(files, [current_file, next_file], current_files[0] if current_files else None)
                         merged_words = current_words + next_words
                         new_file_words.append((merged_file_path, merged_words))
                         i += 2  # 跳过下一个文件
                         merged = True
                         changed = True
-                        debug_log(f"    ✓ 合并后: {os.path.basename(merged_file_path)} ({merged_words:,} 字)")
+                        if debug:
+                            debug_log(f"    ✓ 合并后: {os.path.basename(merged_file_path)} ({merged_words:,} 字)")
                     
                     # 如果无法合并（理论上不应该发生，因为至少有一个相邻文件）
                     if not merged:
-                        debug_log(f"    ⚠ 无法合并（没有相邻文件），保留文件: {file_name} ({current_words:,} 字)")
+                        if debug:
+                            debug_log(f"    ⚠ 无法合并（没有相邻文件），保留文件: {file_name} ({current_words:,} 字)")
                         new_file_words.append((current_file, current_words))
                         i += 1
                 else:
@@ -408,24 +759,27 @@ class TextSplitter:
             
             # 如果第一步有变化，更新文件列表并继续
             if changed:
-                debug_log(f"  规则2有变化，更新文件列表，继续下一轮")
-                debug_log(f"  更新后的文件列表:")
-                for f_path, f_words in new_file_words:
-                    debug_log(f"    {os.path.basename(f_path)}: {f_words:,} 字")
+                if debug:
+                    debug_log(f"  规则2有变化，更新文件列表，继续下一轮")
+                    debug_log(f"  更新后的文件列表:")
+                    for f_path, f_words in new_file_words:
+                        debug_log(f"    {os.path.basename(f_path)}: {f_words:,} 字")
                 # 更新文件列表为合并后的新文件
                 current_files = [f[0] for f in new_file_words]
                 # 验证文件是否存在
                 valid_files = []
                 for f_path in current_files:
-                    if os.path.exists(f_path):
+                    if files.exists(f_path):
                         valid_files.append(f_path)
                     else:
-                        debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(f_path)}")
+                        if debug:
+                            debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(f_path)}")
                 current_files = valid_files
                 continue
             
             # 第二步：合并相邻文件，如果相加少于10万字
-            debug_log(f"\n规则1: 合并相邻文件，如果相加少于 {min_words_per_file:,} 字")
+            if debug:
+                debug_log(f"\n规则1: 合并相邻文件，如果相加少于 {min_words_per_file:,} 字")
             
             final_files = []
             i = 0
@@ -435,7 +789,8 @@ class TextSplitter:
                 current_words = file_words[i][1]    # 当前累计字数
                 current_name = os.path.basename(file_words[i][0])
                 
-                debug_log(f"  处理文件: {current_name} ({current_words:,} 字)")
+                if debug:
+                    debug_log(f"  处理文件: {current_name} ({current_words:,} 字)")
                 
                 # 尝试合并后续文件，直到累计字数达到阈值
                 j = i + 1
@@ -446,63 +801,80 @@ class TextSplitter:
                     combined_words = current_words + next_words
                     
                     if combined_words < min_words_per_file:
-                        debug_log(f"    → 加上 {next_name} ({next_words:,} 字) = {combined_words:,} 字 < {min_words_per_file:,} 字，继续合并")
+                        if debug:
+                            debug_log(f"    → 加上 {next_name} ({next_words:,} 字) = {combined_words:,} 字 < {min_words_per_file:,} 字，继续合并")
                         current_files_to_merge.append(next_file)
                         current_words = combined_words
                         j += 1
                     else:
-                        debug_log(f"    → 加上 {next_name} ({next_words:,} 字) = {combined_words:,} 字 >= {min_words_per_file:,} 字，停止合并")
+                        if debug:
+                            debug_log(f"    → 加上 {next_name} ({next_words:,} 字) = {combined_words:,} 字 >= {min_words_per_file:,} 字，停止合并")
                         break
                 
                 # 如果只有一个文件且字数足够，直接保留
                 if len(current_files_to_merge) == 1 and current_words >= min_words_per_file:
-                    debug_log(f"    ✓ 文件足够大，保留: {current_name} ({current_words:,} 字)")
+                    if debug:
+                        debug_log(f"    ✓ 文件足够大，保留: {current_name} ({current_words:,} 字)")
                     final_files.append(current_files_to_merge[0])
                 else:
                     # 需要合并多个文件
-                    merged_file_path = self._merge_files(current_files_to_merge, current_files[0] if current_files else None)
+                    merged_file_path = self._merge_files_with(files, current_files_to_merge, current_files[0] if current_files else None)
                     merged_name = os.path.basename(merged_file_path)
-                    file_names = [os.path.basename(f) for f in current_files_to_merge]
-                    debug_log(f"    ✓ 合并 {len(current_files_to_merge)} 个文件: {', '.join(file_names)}")
-                    debug_log(f"    → 合并后: {merged_name} ({current_words:,} 字)")
+                    if debug:
+                        file_names = [os.path.basename(f) for f in current_files_to_merge]
+                        debug_log(f"    ✓ 合并 {len(current_files_to_merge)} 个文件: {', '.join(file_names)}")
+                        debug_log(f"    → 合并后: {merged_name} ({current_words:,} 字)")
                     final_files.append(merged_file_path)
                     # 如果合并后仍然小于阈值，标记为需要继续处理
                     if current_words < min_words_per_file:
-                        debug_log(f"    ⚠ 合并后仍然小于 {min_words_per_file:,} 字，标记为需要继续处理")
+                        if debug:
+                            debug_log(f"    ⚠ 合并后仍然小于 {min_words_per_file:,} 字，标记为需要继续处理")
                         changed = True
                 
                 i = j
             
             # 如果第二步有变化，继续递归
             if changed:
-                debug_log(f"  规则1有变化，继续下一轮递归")
-                debug_log(f"  更新后的文件列表:")
+                if debug:
+                    debug_log(f"  规则1有变化，继续下一轮递归")
+                    debug_log(f"  更新后的文件列表:")
                 for f_path in final_files:
-                    if os.path.exists(f_path):
-                        words = self.count_words_in_file(f_path)
-                        debug_log(f"    {os.path.basename(f_path)}: {words:,} 字")
+                    if files.exists(f_path):
+                        words = files.count_words(f_path)
+                        if debug:
+                            debug_log(f"    {os.path.basename(f_path)}: {words:,} 字")
                     else:
-                        debug_log(f"    警告: 文件不存在: {os.path.basename(f_path)}")
+                        if debug:
+                            debug_log(f"    警告: 文件不存在: {os.path.basename(f_path)}")
                 # 验证文件是否存在（合并后原始文件可能已被删除）
                 valid_files = []
                 for f_path in final_files:
-                    if os.path.exists(f_path):
+                    if files.exists(f_path):
                         valid_files.append(f_path)
                     else:
-                        debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(f_path)}")
+                        if debug:
+                            debug_log(f"  警告: 文件不存在，跳过: {os.path.basename(f_path)}")
                 if len(valid_files) != len(final_files):
-                    debug_log(f"  警告: {len(final_files) - len(valid_files)} 个文件不存在，已过滤")
+                    if debug:
+                        debug_log(f"  警告: {len(final_files) - len(valid_files)} 个文件不存在，已过滤")
                 current_files = valid_files
                 continue
             else:
                 # 没有更多变化，返回结果
-                debug_log(f"\n合并完成，最终 {len(final_files)} 个文件")
+                if debug:
+                    debug_log(f"\n合并完成，最终 {len(final_files)} 个文件")
                 for f in final_files:
-                    words = self.count_words_in_file(f)
-                    debug_log(f"  {os.path.basename(f)}: {words:,} 字")
+                    words = files.count_words(f)
+                    if word_counts is not None:
+                        word_counts[f] = words
+                    if debug:
+                        debug_log(f"  {os.path.basename(f)}: {words:,} 字")
                 return final_files
         
         # 如果达到最大迭代次数，返回当前结果
+        if word_counts is not None:
+            for f in current_files:
+                word_counts[f] = files.count_words(f)
         return current_files
     
     def _merge_files(self, file_paths: List[str], reference_file: str = None) -> str:
@@ -514,6 +886,18 @@ class TextSplitter:
         返回:
             合并后的文件路径
         """
+        return self._merge_files_with(_DiskFiles(self), file_paths, reference_file)
+    
+    def _merge_files_with(self, files, file_paths: List[str], reference_file: str = None) -> str:
+        """
+        在给定的文件存储中合并多个文件为一个文件
+        参数:
+            files: 文件存储（_DiskFiles 或 _MemoryFiles）
+            file_paths: 要合并的文件路径列表
+            reference_file: 参考文件路径（用于确定输出目录和命名）
+        返回:
+            合并后的文件路径
+        """
         if not file_paths:
             return None
         
@@ -525,28 +909,21 @@ class TextSplitter:
             ref_dir = os.path.dirname(reference_file)
             ref_base = os.path.splitext(os.path.basename(reference_file))[0]
             # 去掉_partXX后缀
-            if '_part' in ref_base:
-                ref_base = ref_base.rsplit('_part', 1)[0]
+            head, sep, _ = ref_base.rpartition('_part')
+            if sep:
+                ref_base = head
         else:
             ref_dir = os.path.dirname(file_paths[0])
             ref_base = os.path.splitext(os.path.basename(file_paths[0]))[0]
-            if '_part' in ref_base:
-                ref_base = ref_base.rsplit('_part', 1)[0]
+            head, sep, _ = ref_base.rpartition('_part')
+            if sep:
+                ref_base = head
         
         # 生成合并后的文件名
         # 找到第一个和最后一个文件的part编号
-        first_part = None
-        last_part = None
-        for file_path in file_paths:
-            basename = os.path.basename(file_path)
-            if '_part' in basename:
-                try:
-                    part_num = int(basename.split('_part')[1].split('.')[0])
-                    if first_part is None:
-                        first_part = part_num
-                    last_part = part_num
-                except:
-                    pass
+        # 从前往后、从后往前各找到第一个带编号的文件即可，不必解析全部文件名
+        first_part = next((num for num in map(_part_number, file_paths) if num is not None), None)
+        last_part = next((num for num in map(_part_number, reversed(file_paths)) if num is not None), None)
         
         if first_part is not None and last_part is not None:
             if first_part == last_part:
@@ -557,29 +934,7 @@ class TextSplitter:
             merged_filename = f"{ref_base}_merged.txt"
         
         merged_file_path = os.path.join(ref_dir, merged_filename)
-        
-        # 读取并合并文件内容
-        all_content = []
-        for file_path in file_paths:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    all_content.append(content)
-            except Exception as e:
-                print(f"读取文件失败 {file_path}: {e}")
-        
-        # 写入合并后的文件
-        with open(merged_file_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(all_content))
-        
-        # 删除原始文件
-        for file_path in file_paths:
-            try:
-                if file_path != merged_file_path and os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"删除文件失败 {file_path}: {e}")
-        
+        files.merge(file_paths, merged_file_path)
         return merged_file_path
     
     def split_file(self, input_file: str, output_dir: Optional[str] = None) -> List[str]:
@@ -604,8 +959,9 @@ class TextSplitter:
             print(f"无法解析章节: {input_file}")
             return []
         
-        # 统计总字数
-        total_words = sum(self.count_words('\n'.join(ch['content'])) for ch in chapters)
+        # 统计每章和总字数，分割时复用每章字数
+        chapter_words = [self.count_content_words(ch['content']) for ch in chapters]
+        total_words = sum(chapter_words)
         
         # 计算分割份数
         split_count = self.calculate_split_count(total_words)
@@ -620,7 +976,7 @@ class TextSplitter:
             return [input_file]
         
         # 分割章节
-        chapter_groups = self.split_by_chapters(chapters, split_count)
+        chapter_groups = self.split_by_chapters(chapters, split_count, chapter_words)
         
         # 生成输出文件
         base_name = os.path.splitext(os.path.basename(input_file))[0]
@@ -647,62 +1003,69 @@ class TextSplitter:
             章节列表
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            return list(self._iter_chapters_from_file(file_path))
         except Exception as e:
             print(f"读取文件失败 {file_path}: {e}")
             return []
-        
-        chapters = []
+    
+    def _iter_chapters_from_file(self, file_path: str) -> Iterator[Dict]:
+        """
+        逐行读取TXT文件并依次生成解析出的章节，不把整个文件的行列表读入内存
+        参数:
+            file_path: 文件路径
+        返回:
+            章节迭代器，每个章节为 {'title': 标题, 'content': 内容行列表}
+        """
         current_chapter = None
         current_content = []
         
-        for line in lines:
-            line = line.rstrip('\n\r')
-            
-            # 检查是否是章节标题（以等号分隔线为标志）
-            if line.strip() == '=' * 50 or line.strip() == '=' * len(line.strip()):
-                # 遇到分隔线，说明之前的内容是章节标题
-                if current_chapter is not None and current_content:
-                    # 保存上一章
-                    chapters.append({
-                        'title': current_chapter,
-                        'content': current_content
-                    })
-                    current_content = []
+        # 逐行读取大文件时使用较大的缓冲区，减少读取次数
+        with open(file_path, 'r', encoding='utf-8', buffering=1 << 20) as f:
+            for line in f:
+                line = line.rstrip('\n\r')
+                stripped = line.strip()
                 
-                # 读取下一行作为章节标题
-                continue
-            
-            # 检查是否是章节标题（简单判断：单独一行且较短）
-            stripped = line.strip()
-            if stripped and len(stripped) < 100 and not stripped.startswith('='):
-                # 可能是章节标题，但需要进一步确认
-                # 这里简化处理：如果当前没有章节，或者上一行是空行，可能是新章节
-                if current_chapter is None or (current_content and not current_content[-1].strip()):
-                    if current_chapter is not None:
+                # 检查是否是章节标题（以等号分隔线为标志）
+                # 整行只有等号（包括空行）时视为分隔线
+                if not stripped.lstrip('='):
+                    # 遇到分隔线，说明之前的内容是章节标题
+                    if current_chapter is not None and current_content:
                         # 保存上一章
-                        chapters.append({
+                        yield {
                             'title': current_chapter,
                             'content': current_content
-                        })
-                    current_chapter = stripped
-                    current_content = []
+                        }
+                        current_content = []
+                    
+                    # 读取下一行作为章节标题
                     continue
-            
-            # 普通内容行
-            if current_chapter is None:
-                current_chapter = '前言'
-            current_content.append(line)
+                
+                # 检查是否是章节标题（简单判断：单独一行且较短）
+                if stripped and len(stripped) < 100 and not stripped.startswith('='):
+                    # 可能是章节标题，但需要进一步确认
+                    # 这里简化处理：如果当前没有章节，或者上一行是空行，可能是新章节
+                    if current_chapter is None or (current_content and not current_content[-1].strip()):
+                        if current_chapter is not None:
+                            # 保存上一章
+                            yield {
+                                'title': current_chapter,
+                                'content': current_content
+                            }
+                        current_chapter = stripped
+                        current_content = []
+                        continue
+                
+                # 普通内容行
+                if current_chapter is None:
+                    current_chapter = '前言'
+                current_content.append(line)
         
         # 保存最后一章
         if current_chapter:
-            chapters.append({
+            yield {
                 'title': current_chapter,
                 'content': current_content
-            })
-        
-        return chapters
+            }
 
 
 if __name__ == '__main__':